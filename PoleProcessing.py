@@ -23,9 +23,10 @@ Inputs
     CSV Files
         *This is set up to work with the file structure directly exported from 
         the HOBO app. It can be adjusted, but please do so at your own risk
-        *Please do not rename files that have exported from the HOBO app--
-        parts of the file name are used to match the data with that sensor's 
-            biographical information (elevation, lat, long, deployment date, etc). 
+        *The serial number written in the header of each exported file is 
+        used to match the data with that sensor's biographical information 
+            (elevation, lat, long, deployment date, etc), so please leave the 
+            first few lines of the files as the HOBO app wrote them. 
 
         *You must have a pole information csv file (refered to as Poles.csv in 
         this document) that contains the following information in order: 
@@ -53,25 +54,50 @@ Inputs
             PoleProcessing.py (this file) as well as a functions.py file. They
             must be kept in the same directory (one level up from the collection)
             of data files.
+        *plots.py draws the temperature and snow coverage profiles for each 
+            pole and needs to sit next to functions.py as well.
+        *cube.py holds the daily results for every pole, day and sensor 
+            height in one block (snowCube) that Section Six reads from. It 
+            also needs to sit next to functions.py.
+        *interpolation.py estimates the snow depth between the poles for the 
+            basin maps in Section Six. It needs scipy.
+        *archive.py saves the hourly temperatures in the Archive folder (see 
+            Section Two) and reads them back. Same deal, next to functions.py.
+        *pipeline.py is optional. It does the same processing as this file 
+            (CombinedData through summary, plus the temperature profile plots) 
+            from the command line without any CHANGE ME editing, which is 
+            handy for running it on a schedule. For example:
+                python pipeline.py CSVFiles --poles Poles.csv --winter 20201001 20210630 --no-plots
+            --no-plots skips the plots entirely (matplotlib is never loaded), 
+            --daily-only goes straight from the HOBO files to the daily 
+            averages without making CombinedData (much less memory), and 
+            python pipeline.py --help lists the rest of the options.
 
 
 Outputs
 This creates a variety of plots (.png) and tables(.csv) files to help you better 
 understand your data. Below is a brief description of each file it makes and 
 the contents therein. Please feel free to rename the files however you please, 
-csv files are all created on lines that read 
-someArrayName.to_csv(inPath+'FILENAMEHERE.csv'). Plots are saved with the line 
+the main tables are all created on lines that read 
+writeTable(someArrayName, inPath+'FILENAMEHERE', outputFormat). Plots are saved with the line 
 plt.savefig(inPath +'FILENAME'+'.png'). For those unfamiliar with Python, leave 
 the quotation marks in there.
 
+The four main tables (combinedData, dailyAverages, depths and summary) are 
+.csv files unless outputFormat in Section One is changed to 'parquet' or 
+'feather'. Those hold the same columns, but with whole-number columns 
+(dates, pole numbers, snow codes) stored as integers and without the row 
+number column on the left. readTable in functions.py opens any of the three.
+
 Biographical Information in this context refers to the information contained 
 in the Poles.csv files that describes where the poles are and which sensors 
 are on each pole.
 
 
 combinedData.csv: This is the master file that has all of the data for all 
-    of the poles on all the dates (hence why it is referred to as LargeFrame as a 
-    variable name).
+    of the poles on all the dates. Inside the script it's kept as two smaller 
+    tables (sensors and measurements) that are only joined together when this 
+    file is written.
     It has the biographical information of the pole 
     (lat, long, deployment info, etc), the date and hour on which a particular
     data point was recorded and the temperature. This file is created BEFORE 
@@ -90,6 +116,19 @@ dailyAverages.csv: This file is a direct product of the combinedData.csv file
     for the calculations are given in Section Three. More information about the 
     choices we made in the coding and why is available from the literature 
     references. 
+    Each row is one calendar day, so days with missing hours still line up 
+    with the right date. DaySince counts calendar days from the first day the 
+    sensor recorded, and dailyMin, dailyMax and sampleCount are the coldest 
+    and warmest reading of the day and how many readings went into it.
+    EpochDay is the date as the number of days since January 1st 1970. It's 
+    what all of the later steps use, since the days between two dates is 
+    just one minus the other (ymdToDays and daysToYmd in functions.py go 
+    back and forth between it and the yyyymmdd format).
+    
+thresholdSweep.csv: the snow coding options from Section Three side by side. 
+    One row per set of limits (maxVariance, minTemp, maxTemp) per pole per 
+    sensor height, with the number of days coded as snow (coverageDays) and 
+    the first and last of them (firstYMD, lastYMD, zeros if there were none).
     
 poleXXXX.csv: a subset of the dailyAverages array for each pole number
      The XXXX indicates the pole number and is set automatically. The column 
@@ -99,7 +138,8 @@ depths.csv: File that indicates the presence or absence of snow at each sensor
     for each date that there was data recorded. The majority of the columns 
     follow previous convention, with the exception of the last four 
     (025mYN, 05N, 1mYN and 2mYN) Those columns are yes (1) or no (0) snow 
-    recorded at that sensor depth for the indicated pole on every date
+    recorded at that sensor depth for the indicated pole on every date. 
+    The last column is EpochDay, same as dailyAverages.csv
     
 summary.csv: Summary file displays the snow coverage information for each pole 
     on a given winter.
@@ -116,6 +156,38 @@ summary.csv: Summary file displays the snow coverage information for each pole
     firstYMDshield, lastYMDshield, durationshield: same as above but for the 
         sensor at the shield depth
     
+seasonSummary.csv: the same as summary.csv, but for every winter in the data 
+    at once: one row per pole per snow season, with an extra Season column 
+    (the year the season started in, so 2020 is the 2020-2021 winter). 
+    Seasons start on seasonStart in Section Five.
+    
+snowPeriods.csv: every separate stretch of snow cover at each pole, height 
+    and season, so thaws in the middle of the winter show up. A height counts 
+    as covered when the snow is at least that deep (same as depths.csv). 
+    Columns: pole, height, season, the period's number, its first and last 
+    date (startYMD, endYMD), its length in days and the days without snow 
+    since the period before it (gapBefore).
+    
+coverageTotals.csv: snowPeriods added up for each pole, height and season: 
+    the number of periods, the days actually covered (coveredDays), the days 
+    of thaw in between (thawDays), the first and last snow date and the days 
+    between them (span, the same as duration in the summary files).
+    
+RunReport.json: how long each step of the run took, how many rows it went 
+    through and how much memory it used (see reportFile in Section One). 
+    Handy for figuring out which part is slow when a run takes forever.
+    
+Archive folder: every sensor's hourly temperatures as a binary file of 32 bit 
+    floats (serial number.f32, one value per hour, blank where there was no 
+    reading) plus index.json, which says which hours each file covers and 
+    which pole it's on (see archiveDir in Section Two). Open it with 
+    openArchive in archive.py to read any sensor and dates without loading 
+    the rest.
+    
+Cache folder: the processed version of every HOBO file, saved so that files that
+    haven't changed don't have to be processed again on the next run (see 
+    cacheDir in Section Two). You can delete it whenever you like.
+
 temperatureProfileXXXX.png: the temperature profile in Fahrenheit for each of 
 the four sensors on a pole for the duration of their deployment
     the XXXX is automatically set to be the pole number
@@ -162,6 +234,9 @@ Python Things that May be Useful: you shouldn't technically need any of this
     
     datetime data type documentation
     https://docs.python.org/3/library/datetime.html
+    
+    numpy dates (datetime64), what the day numbers get turned into for plotting
+    https://numpy.org/doc/stable/reference/arrays.datetime.html
 
     matplotlib (how the plots are made) cheat sheet
     https://matplotlib.org/cheatsheets/
@@ -189,10 +264,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import glob
 from functions import *
+from plots import renderPolePlots
+from cube import buildCube
+from archive import appendToArchive
+from interpolation import basinMaps
+from instrumentation import startReport, measureStage, finishReport
 from matplotlib import cm
 from mpl_toolkits import mplot3d
 import scipy as sp
-from datetime import date
 print("All packages loaded. You are cleared to proceed.")
 print("If the IDE complains about unimported packages, check the functions.py file; they might be in there.")
 
@@ -200,6 +279,16 @@ print("If the IDE complains about unimported packages, check the functions.py fi
 #CHANGE ME: define path name--this is the path to the subdirectory where your csv datafiles (the ones directly exported from HOBO) live
 inPath = r'C:\Users\bpresler-marshall\OneDrive - Hoonah Indian Association\SnowPack Things\Data_2021\CSVFiles'
 
+#CHANGE ME: file type for the CombinedData, DailyAverages, depths and summary tables. 'csv' (the default) opens in excel.
+#'parquet' or 'feather' make much smaller files that are a lot faster to save and for other programs (notebooks, dashboards)
+#to open again, but need the pyarrow package installed. Use readTable from functions.py to open any of them back up.
+outputFormat='csv'
+
+#CHANGE ME: how long each step takes, how many rows it gets through and how much memory it uses are printed as it goes and 
+#saved to this file at the end of Section Five (see instrumentation.py). Set it to None to not save it.
+reportFile=inPath+'RunReport.json'
+report=startReport()
+
 
 
 
@@ -207,44 +296,66 @@ inPath = r'C:\Users\bpresler-marshall\OneDrive - Hoonah Indian Association\SnowP
 Section Two: Making the master dataFrame/spreadsheet that has all of the raw data concatinated together
 """
 print("Loading Files. Please be patient.")
-#these names will be used in the master Pandas dataframe
-names=['SerialNumber', 'Height', 'PoleNumber', 'DeployYear', 'DeployMonth','DeployDat','latitude', 
- 'longitude', 'TrasectNumber', 'DataYear', 'DataMonth', 'DataDay', 'DataHour', 'Temperature']
+#the names used in the master Pandas dataframe (combinedNames) are kept in functions.py
 
 
-#set up poles data frame
-#this has serial number, depth, pole number, location and deployment date in that order
-#requires transposing to make Pandas happy about how the data is being read
+#set up the pole information
+#this has serial number, depth, pole number, deployment date, location, transect and elevation in that order
+#it's read once into a lookup table by serial number (see loadPoles in functions.py), so a data file from a sensor
+#that isn't in the file stops the script with a message saying which one
 
 #CHANGE ME--poleFile should be whatever you've named your .csv file that has the pole biographical inforamtion. Keep the quotes around it. 
 poleFile='Poles.csv'
-poles_df = pd.read_csv(poleFile)
-p2=poles_df.T
-indexes=p2.index
-#reformat to numpy  from pandas
-np_poles=poles_df.to_numpy()
+poleRegistry=loadPoles(poleFile)
 
 #set up list of files to look in
 fileList=[]
 #make set of files to loop through--for each .csv file in your collection, add it to the list
-for file in glob.glob(inPath+'\*.csv', recursive=True):
+for file in glob.glob(os.path.join(inPath,'*.csv'), recursive=True):
     fileList.append(file)
     
-#create the big cheese of data frames (this will eventually become the combinedData.csv file described in the README file)
-#the myDF line is why you shouldn't rename the files after exporting them from HOBO. The [-42:] cuts the sensor number and is expecting that number to be in a particular location.
-largeFrame=pd.DataFrame(columns=names)  
-for i in range(len(fileList)): #for each file in your list
-    myFile=fileList[i] 
-    myDF=createArray(myFile[-42:], inPath, np_poles) 
-    largeFrame=largeFrame.append(myDF)
+#create the big cheese of data (this will eventually become the combinedData.csv file described in the README file)
+#the serial number of each sensor is read from the header inside its file, so the file names themselves don't matter
+#to save memory it's kept in two pieces: sensors has one row of pole information per sensor, and measurements has every 
+#reading but only a sensor number, time and temperature for each. They only get joined together when CombinedData is saved
+
+#CHANGE ME: number of processes used to read the files. 1 reads them one at a time, a bigger number reads that many 
+#files at once on different cores of your computer (None uses all of them). The results come back in the same order 
+#either way, so CombinedData.csv is identical. On Windows and Macs the extra processes re-run the file that started them,
+#which needs the if __name__ == '__main__': protection that this script doesn't have, so leave it at 1 there when
+#running this file directly (pipeline.py has that protection, use its --workers option instead). Linux is fine either way.
+workers=1
+
+#CHANGE ME: folder where the processed version of each file is saved. Files that haven't changed since the last run are 
+#loaded from here instead of being processed again, so adding one new export doesn't mean redoing the whole collection. 
+#It's safe to delete the folder at any time, it just gets rebuilt on the next run. Set it to None to not use a cache at all.
+cacheDir=inPath+'Cache'
+
+#CHANGE ME: for really big exports (several years, or readings every few minutes) set this to a number of rows, like 100000,
+#and each file gets read that many rows at a time instead of all at once, which needs a lot less memory. None reads whole files.
+chunkSize=None
+with measureStage(report, 'ingest') as stage:
+    fileRecords=loadFiles(fileList, inPath, poleRegistry, workers, cacheDir, chunkSize)
+    sensors, measurements=stackRecords(fileRecords)
+    stage['rows']=len(measurements)
+
+#CHANGE ME: folder for the hourly archive, a binary copy of every sensor's hourly temperatures that later work can read any 
+#sensor and dates from straight off the disk (see archive.py), without going through CombinedData.csv again. Every run adds 
+#its readings to it, and readings that are already in it are just written over, so nothing gets doubled up. Set it to None 
+#to not keep an archive.
+archiveDir=inPath+'Archive'
+if archiveDir is not None:
+    with measureStage(report, 'archive', len(measurements)):
+        appendToArchive(archiveDir, sensors, measurements)
 
 
 
 #save all of the combined data and the information about the pole/sensor it came from into one massive csv file
 #if you'd like to rename this, feel free to do so, a different name won't break anything (or shouldn't anyway)
 #more information about the contents of the CombinedData file can be found in the README section of this file
-largeFrame.to_csv(inPath+'CombinedData.csv')
-print("CombinedData.csv has been created.")
+with measureStage(report, 'writeCombinedData', len(measurements)):
+    writeCombinedData(sensors, measurements, inPath+'CombinedData', outputFormat)
+print("CombinedData.%s has been created." %outputFormat)
 
 
 
@@ -252,103 +363,46 @@ print("CombinedData.csv has been created.")
 Section Three: Making daily averages and adding initial coding of the snow/no snow parameter
 """
 
-#new names for daily averages data frame
-averageNames=['SerialNumber', 'Height', 'PoleNumber',  'DeployMonth','DeployDat','DeployYear','latitude', 
- 'longitude', 'TrasectNumber', 'DataYear', 'DataMonth', 'DataDay', 'DaySince','Temperature','snowNoSnow', 'dailyVariance', 'Datayyyymmdd']
-
-#initialize empty frame-- this will eventually become the dailyAverages.csv file described in the README section above
-dailyAverages=pd.DataFrame(columns=averageNames)
-#make daily averages for each sensor and code snow no snow
-#for i in range(2):                     #version for testing
-for i in range(len(fileList)):        #version for working--loop over each of the csv files in your collection
-    thisSensor=fileList[i][-38:-30] #cut out serial number
-    thisSensorData=largeFrame.loc[largeFrame['SerialNumber']==float(thisSensor)] #find the data that corrolates with your sensor of interest by matching serial numbers
-    #thisSensorData.to_csv(inPath+'thisSensorData.csv')
-    thisSensorData=thisSensorData.to_numpy()
-    a,b=np.shape(thisSensorData) #shape of the array, for later reference
-    
-    myArray=np.zeros(((int(a/24))+1,len(averageNames))) #set up array that is (number of days+1) by (number of columns/names)
-    day=0
-    dailyTemp=0
-    tempsRun=[]
-    
-    #for each hour of data, get the temp and add to the running total for the day
-    for j in range(a):
-        hour=thisSensorData[j][12]
-        temp=thisSensorData[j][13]
-        dailyTemp+=temp
-        tempsRun.append(temp)
-        
-        if np.mod(j,24)==0: #every 24 hours, cutting at midnight
-            #pull dates
-            yyyy=str(int(thisSensorData[j,9]))
-            mm=int(thisSensorData[j,10])
-            dd=int(thisSensorData[j,11])
-            
-          #  print('yyyy', yyyy)
-          #  print('mm', mm)
-          #  print('dd', dd)
-            
-            #if the day or month is in the single digits, add a leading zero to make the date formatter happy later on
-            if mm <= 9:
-                mm="0"+str(mm)
-            if dd <= 9:
-                dd="0"+str(dd)
-            
-            #create the yyyymmdd format and add to array
-            ymd=yyyy+str(mm)+str(dd)
-            myArray[day][16]=ymd
-            
-            
-           #calculate daily average temperature
-            aveTemp=dailyTemp/24
-            myArray[day][13]=aveTemp
-            myArray[day,0:12]=thisSensorData[j,0:12] #copy most of the contents of the df to carry along the records
-            myArray[day][12]=day
-           # print('day',day)
-            #calculate variance for the day
-            variance=np.var(tempsRun)
-            myArray[day][15]=variance
-            
-              
-              
-            #coding for the snow versus no snow column
-            # you've got some options here, so feel free to change which line is uncommented depending on how you want to estimate the snow coverage
-            #the first version is the most conservative, and is probably an over estimate of the amount of snow
-            #the second version is the recommended one
-            #the third version has the tightest restrictions on what counts as snow coverage
-            
-            #if variance <1.5 and variance >0 and aveTemp<=35.6 and aveTemp>=28.4:  #most conservative version +pm 2 C
-            if variance <1 and variance >0 and aveTemp<=33 and aveTemp>=29.3:
-           # if variance <1 and variance >0 and aveTemp<=33 and aveTemp>=30:
-               
-                myArray[day][14]=1
-            else:
-                myArray[day][14]=0
-                  
-        
-            #over write variables to prepare them for use the next day
-            dailyTemp=0
-            day=day+1
-            tempsRun=[]
-            
-            
-                        
-    
-    #convert array into df (just unit conversion between numpy and pandas)
-    thisAverage=pd.DataFrame(myArray, columns=averageNames)
-    #append to daily averages frame
-    dailyAverages=dailyAverages.append(thisAverage)
-    
+#the names of the daily averages columns (averageNames) are kept in functions.py next to makeDailyAverages
+
+#make daily averages for each sensor and code snow no snow--this will eventually become the dailyAverages.csv file described in the README section above
+#the readings are grouped by the calendar date they were taken on, so a missing hour (or day) only affects the day it's missing from
+#coding for the snow versus no snow column
+# you've got some options here, so feel free to change which line is uncommented depending on how you want to estimate the snow coverage
+#the first version is the most conservative, and is probably an over estimate of the amount of snow
+#the second version is the recommended one
+#the third version has the tightest restrictions on what counts as snow coverage
+
+with measureStage(report, 'daily', len(measurements)):
+    #dailyAverages=makeDailyAverages(sensors, measurements, maxVariance=1.5, minTemp=28.4, maxTemp=35.6)  #most conservative version +pm 2 C
+    dailyAverages=makeDailyAverages(sensors, measurements, maxVariance=1, minTemp=29.3, maxTemp=33)
+    #dailyAverages=makeDailyAverages(sensors, measurements, maxVariance=1, minTemp=30, maxTemp=33)
     
 #make gigantic csv file
 #more information about the contents of the DailyAverages file can be found in the README section of this file
-dailyAverages.to_csv(inPath+'DailyAverages.csv')
-print("DailyAverages.csv has been created.")
+with measureStage(report, 'writeDailyAverages', len(dailyAverages)):
+    writeTable(dailyAverages, inPath+'DailyAverages', outputFormat)
+print("DailyAverages.%s has been created." %outputFormat)
+
+#compare the snow coding options above without running everything again: every set of limits in thresholds is tried 
+#at once on the daily averages, and thresholdSweep gets the number of snow days and the first and last snow date for each 
+#pole and sensor height under each set. 
+#CHANGE ME: add your own (maxVariance, minTemp, maxTemp) sets, or use thresholdGrid to try every combination of a few values, e.g.
+#thresholds=thresholdGrid([0.5, 1, 1.5], [28.4, 29.3, 30], [33, 35.6])
+thresholds=[(1.5, 28.4, 35.6), (1, 29.3, 33), (1, 30, 33)]
+with measureStage(report, 'thresholdSweep', len(dailyAverages)*len(thresholds)):
+    sweep=sweepThresholds(dailyAverages, thresholds)
+with measureStage(report, 'writethresholdSweep', len(sweep)):
+    writeTable(sweep, inPath+'thresholdSweep', outputFormat)
+print("thresholdSweep.%s has been created." %outputFormat)
+
+#lookup table of which rows of dailyAverages belong to each pole
+#these get built once here so that every later section can grab a pole or sensor without searching the whole frame
+poleIndex=buildIndex(dailyAverages, 'PoleNumber')
 
 #plot that stuff up: this makes the temperature profile for each pole (all four sensors) as a function of time. 
 #the dates on the axises must be manually set in the functions.py file. 
-polePlotter(14,dailyAverages,inPath)
+polePlotter(14,dailyAverages,inPath,poleIndex)
 print("The temperature profiles for each pole have been created.")
 
 """
@@ -359,138 +413,27 @@ large csv and dataframe
 #list of pole numbers, omiting pole 2 which has vanished 
 poleList=[1,3,4,5,6,7,8,9,10,11,12,13,14]
 
-#hardcoded in version, technically this should be in the poleInformation file as well
-elevations=[424,380,238,270,294,493,390,293,248,287,357,267,382,321]
-
-#new names for data frame that will describe snow depth on each date for each pole
-snowCoverNames=['PoleNumber',  'DeployMonth','DeployDat','DeployYear','latitude', 
- 'longitude', 'TrasectNumber', 'DataYear', 'DataMonth', 'DataDay', 'depth', 'YYYYMMDD', 'elevation']
-
-a,b=np.shape(dailyAverages)
-#initalize empty frame and some blank variables
-#setting each of the snow codes to zero means the default is to assume no snow and must later be proven otherwise
-snow=pd.DataFrame(columns=snowCoverNames)
-snow['025mYN']=0
-snow['05N']=0
-snow['1mYN']=0
-snow['2mYN']=0
-
-#for each of the poles in your array
-for i in range(len(poleList)):
-
-    #get the data for the pole you're talking about
-    thisPole=poleList[i]
-    thisPoleData=dailyAverages.loc[dailyAverages['PoleNumber']==float(thisPole)]
-    thisElevation=elevations[i]
-    
-   # break a pole's worth of information apart into its constituent sensors
-   #there's a lot of unit conversion here to make numpy happy as well
-    pole=thisPoleData
-    meter025=pole.loc[pole['Height']==float(0.25)]
-    meter05=pole.loc[pole['Height']==float(0.5)]
-    meter1=pole.loc[pole['Height']==float(1)]
-    meter2=pole.loc[pole['Height']==float(2)]
+#the elevation of each pole comes from the Elevation column of the pole information file
+poleElevations=elevationsByPole(poleRegistry)
 
-    meter025=meter025.to_numpy()
-    meter05=meter05.to_numpy()
-    meter1=meter1.to_numpy()
-    meter2=meter2.to_numpy()
-   
-    
-    a,b=np.shape(meter025)
-    c,d=np.shape(meter05)
-    e,f=np.shape(meter1)
-    g,h=np.shape(meter2)
-    
-   
-   #force sizes of sensor read outs to be the same for each sensor on a pole--this deals with missing or damaged data from one or more sensors on a pole.
-    maxLength=np.max([a,c,e,g]) #find the maximum data range of any sensor on a particular pole
-   
-    if a!=maxLength:                            #if array for 025 meter is too small
-        diff=np.abs(maxLength-a)
-        pads=np.zeros((diff,b))
-        meter025=np.concatenate((meter025,pads))
-    if c!=maxLength:                             #if array for 05 meter is too small
-        diff=np.abs(maxLength-c)
-        pads=np.zeros((diff,b))
-        meter05=np.concatenate((meter05,pads))
-    if e!=maxLength:                             #if array for 1 meter is too small
-        diff=np.abs(maxLength-e)
-        pads=np.zeros((diff,b))
-        meter1=np.concatenate((meter1,pads))
-    if g!= maxLength:                            #if array for the shield is too small
-        diff=np.abs(maxLength-g)
-        pads=np.zeros((diff,b))
-        meter2=np.concatenate((meter2,pads))
-    
-    #this will eventually be populated with the depths for each date for an individual pole
-    snowCoverArray=np.zeros((maxLength,len(snow.columns)))
-    
-    thisPoleData=thisPoleData.to_numpy()
-    #loop over each date of data
-    depth=0 #assume no snow until prove otherwise
-    for j in range(np.max([a,c,e,g])): #for each date on each pole:
-    #for j in range(10):
-        #copy and paste most information from the daily averages pole into this frame. It's lat, long, obs days, pole number etc
-        #all the sort of header stuff
-        snowCoverArray[j,0:10]=thisPoleData[j,2:12]
-        depth=0
-        snowCoverArray[j,13]=0
-        
-        
-        #calculate snow depth by elif-fing over each potential depth to see if they've thrown a YES snow code
-        if meter025[j,14]==1:
-            depth=0.25
-            snowCoverArray[j,13]=1 #through code for 25 meter
-            
-        if meter05[j,14]==1 and meter025[j,14]==1:
-            depth=0.5
-           # snowCoverArray[j,13]=1
-            snowCoverArray[j,14]=1  #code of 25 and 05 meter being covered
-        if meter1[j,14]==1 and meter025[j,14]==1 and meter05[j,14]==1:
-            depth=1
-           # snowCoverArray[j,13]=1 #code for 1 meter, 0.5 and 0.25 being covered
-           # snowCoverArray[j,14]=1
-            snowCoverArray[j,15]=1
-            
-            
-        if meter2[j,14]==1 and meter1[j,14]==1 and meter025[j,14]==1 and meter05[j,14]:
-            depth=2
-          #  snowCoverArray[j,13]=1 #throw codes for all four sensors being covered
-          #  snowCoverArray[j,14]=1
-           # snowCoverArray[j,15]=1            
-            snowCoverArray[j,16]=1
-        
-        
-        #record said depth
-        snowCoverArray[j,10]=depth
-        
-        
-        #date formatting to make datetime happy later on
-        #is it pretty? no. does it work? I hope so.
-        YYYY=str(int(thisPoleData[j,9]))
-        MM=int(thisPoleData[j,10])
-        DD=int(thisPoleData[j,11])
-        
-        if MM <= 9:
-            MM="0"+str(MM)
-        if DD <= 9:
-            DD="0"+str(DD)
-        
-        YYYYMMDD=YYYY+str(MM)+str(DD)
-        snowCoverArray[j,11]=YYYYMMDD
-        snowCoverArray[j,12]=thisElevation
-        
-        
-    #append this poles depth to the large array and do some unit conversion between numpy and pandas
-    cover=pd.DataFrame(snowCoverArray, columns=snow.columns)
-    snow=snow.append(cover)
-    
+#the names of the depth columns (snowCoverNames, and the snow codes for each sensor in snowCodeNames) are kept in functions.py next to codeDepths
+
+#line up the snow codes of the four sensors on each pole by date and work out the depth on every date for every pole at once
+#a sensor with no reading on a date counts as no snow on that date
 #make gigantic csv file
-depths=snow
+with measureStage(report, 'depths', len(dailyAverages)):
+    depths=codeDepths(dailyAverages, poleList, poleElevations)
+snow=depths
 snow=snow.to_numpy()
-depths.to_csv(inPath+'depths.csv')
-print("depths.csv has been created.")
+with measureStage(report, 'writedepths', len(depths)):
+    writeTable(depths, inPath+'depths', outputFormat)
+print("depths.%s has been created." %outputFormat)
+
+#every pole's daily temperature, variance, snow code and depth in one dense block with a slot for each pole, day and sensor 
+#height (see cube.py), so looking up a date, a pole or a height is just indexing instead of searching dailyAverages or depths again. 
+#days without data are blank (nan)
+with measureStage(report, 'cube', len(dailyAverages)):
+    snowCube=buildCube(dailyAverages, depths, poleList)
 
 
 
@@ -510,29 +453,27 @@ This is also the bit that makes the snow duration plots
 #CHANGE ME: select your own date range of which winter of data you want to look at. Date format should be YYYYMMDD.
 #select dates before what you think the first snow is and after when you think the spring melt off is for your region of interest.
 winterStart=20201001     # dates defining the winter of 2020-2021
-winterEnd=20210631
+winterEnd=20210630
 
 #winterStart=20191001    #dates definining the winter of 2019-2020
-#winterEnd=20200631
+#winterEnd=20200630
+
+#CHANGE ME: the seasonSummary file has every winter in your data instead of just the one above. Each date belongs to the 
+#season that started on the last seasonStart (as month and day, MMDD) before it, so with 801 everything from August 1st 2020 
+#to July 31st 2021 is the 2020 season. Pick a summer day when there's no snow anywhere.
+seasonStart=801
 
 
 
 
-#function to get the number of days between two dates
-#inputs: ymd1 and ymd2 must be floats in the yyyymmdd format (so that December 4, 2020 would be 20201204, for example)
+#function to get the number of days between two dates, for whole columns of dates at once
+#inputs: ymd1 and ymd2 must be floats (or arrays of them) in the yyyymmdd format (so that December 4, 2020 would be 20201204, for example)
 #outputs: a duration in days between ymd1 and ymd2 that accounts for the different lengths of months and things like that
-#returns: an integer number of days
+#returns: the number of days, zero wherever either date is zero (for example, if the poles didn't freeze over or the data is just missing)
+#the dates are turned into day numbers (days since 1970) with ymdToDays, after which it's just a subtraction
 def numOfDays(ymd1,ymd2):
-    #if there are in fact non zero dates
-    if ymd1!=0 and ymd2!=0:
-        date1=date(int(str(ymd1)[0:4]), int(str(ymd1)[4:6]), int(str(ymd1)[6:8]))
-        date2=date(int(str(ymd2)[0:4]), int(str(ymd2)[4:6]), int(str(ymd2)[6:8]))
-    #if the dates are messed up (for example, if the poles didn't freeze over or the data is just missing), hardcode the dates to be january 1, 2020 
-    #this is just so that the formatting is alright so that it can return a duration of zero days without panic
-    else:
-        date1=date(2020,1,1)
-        date2=date(2020,1,1)
-    return (date2-date1).days
+    days=np.nan_to_num(ymdToDays(ymd2)-ymdToDays(ymd1))
+    return days
 
 
 
@@ -545,158 +486,74 @@ def numOfDays(ymd1,ymd2):
 poleList=[1,3,4,5,6,7,8,9,10,11,12,13,14]    #complete-sh version
 #poleList=[1,3,4,5,6,7,8,9]                  #deployed in 2019 version
 
-#this makes the temperature profiles for each pole as well as a .csv file that has the dailyAverages information but only for that one pole
-#your computer may complain about polePlotter not existing, it's alive and well in the functions.py file.
-for i in poleList:
-    polePlotter(i, dailyAverages,inPath)
-print("The temperature profiles for each pole have been created.")
+#this makes the temperature profiles and snow coverage profiles for each pole as well as a .csv file that has the dailyAverages 
+#information but only for that one pole. your computer may complain about renderPolePlots not existing, it's alive and well in 
+#the plots.py file. Each figure is closed as soon as it's saved, so they don't pile up no matter how many poles there are.
+#CHANGE ME: the last number is how many poles get drawn at once on different cores (same caveat about Windows and Macs as workers)
+with measureStage(report, 'plots'):
+    renderPolePlots(dailyAverages, depths, poleList, inPath, 1)
+print("The temperature and snow coverage profiles for each pole have been created.")
 
 
-#new names for summary data frame
-summaryNames=['PoleNumber',  'DeployMonth','DeployDat','DeployYear','latitude', 
- 'longitude', 'TrasectNumber', 'firstYMD025','lastYMD025','duration025', 
-                                 'firstYMD05','lastYMD05','duration05'
-                                 , 'firstYMD1','lastYMD1','duration1', 
-                                 'firstYMDshield','lastYMDshield','durationshield', 'Elevation']
-
-#initialize empty frame--this will later have all of the information described by summaryNames in it
-summaryArray=np.zeros((len(poleList), len(summaryNames)))
-#loop over each logger to find when it detected snow
-for i in range(len(poleList)):
-    #set up data frame--pull the info you want out of daily averages by SN
-    thisPoleData=depths.loc[depths['PoleNumber']==float(poleList[i])]
-    #thisSensorData=thisSensorData.loc[thisSensorData['DataYear']!=2019]
-    
-    
-    #unit conversion
-    thisPoleData=thisPoleData.to_numpy()
-    a,b=np.shape(thisPoleData)
-    averages=dailyAverages.to_numpy()
-    
-    
-    summaryArray[i,0:7]=thisPoleData[i,0:7] #copy biographic information about pole (latitude, longitude, etc)
-    summaryArray[i,19]=thisPoleData[i,12] #elevation gets moved over separately because this script was written by an idiot
-    
-    #loop over every data point for a particular pole, all sensors
-    for j in range(a):
-
-        t=np.where(thisPoleData[:,13]==1) #IS THERE SNOW AT 0.25 METERS
-        b=t[0]  #this is just to handle nonsense with tuples
-        chillDatesWithSnow025=[]
-        for k in range(len(t[0])): #for each date where there is snow
-            #see if the date for the yeah snow code is within the desired range
-            thisDate=thisPoleData[b[k],11]
-            if winterStart <=thisDate and thisDate <= winterEnd: #if the date is in the desired range
-                chillDatesWithSnow025.append(thisDate)
-                
-        
-        
-        #first day of snow, last day of snow, duration of snow depth
-        #dates in the yyyymmdd format (floats)
-        summaryArray[i][7]=chillDatesWithSnow025[0]
-        summaryArray[i][8]=chillDatesWithSnow025[-1]
-        summaryArray[i][9]=numOfDays(chillDatesWithSnow025[0],chillDatesWithSnow025[-1])
-        
- 
-        t=np.where(thisPoleData[:,14]==1) #IS THERE SNOW AT 0.5 METERS
-        b=t[0]  #this is just to handle nonsense with tuples
-        chillDatesWithSnowHalf=[]
-        for k in range(len(t[0])): #for each date where there is snow
-            #see if the date for the yeah snow code is within the desired range
-            thisDate=thisPoleData[b[k],11]
-            if winterStart <=thisDate and thisDate <= winterEnd:
-              
-                chillDatesWithSnowHalf.append(thisDate)
-                
-        #if the pole never froze over or the data is just missing--hard code in zeros
-        if len(chillDatesWithSnowHalf) !=0:
-            summaryArray[i][10]=chillDatesWithSnowHalf[0]
-            summaryArray[i][11]=chillDatesWithSnowHalf[-1]
-            summaryArray[i][12]=numOfDays(chillDatesWithSnowHalf[0],chillDatesWithSnowHalf[-1])
-        else:
-            summaryArray[i][10]=0
-            summaryArray[i][11]=0
-            summaryArray[i][12]=0
-        
+#the names of the summary columns (summaryNames) are kept in functions.py next to summarizeWinter
 
-        t=np.where(thisPoleData[:,15]==1) #IS THERE SNOW AT ONE METER
-        b=t[0]  #this is just to handle nonsense with tuples
-        chillDatesWithSnowOne=[]
-        for k in range(len(t[0])): #for each date where there is snow
-            #see if the date for the yeah snow code is within the desired range
-            thisDate=thisPoleData[b[k],11]
-            if winterStart <=thisDate and thisDate <= winterEnd:
-              #  print("thisDate: ", thisDate)
-                chillDatesWithSnowOne.append(thisDate)
-                
-        
-        #if the pole never froze over or the data is just missing--hard code in zeros
-        if len(chillDatesWithSnowOne)!=0:
-            summaryArray[i][13]=chillDatesWithSnowOne[0]
-            summaryArray[i][14]=chillDatesWithSnowOne[-1]
-            summaryArray[i][15]=numOfDays(chillDatesWithSnowOne[0],chillDatesWithSnowOne[-1])
-        else: 
-            summaryArray[i][13]=0
-            summaryArray[i][14]=0
-            summaryArray[i][15]=0
-        
-      
-        t=np.where(thisPoleData[:,16]==1) #IS THERE SNOW AT THE SHIELD DEPTH
-        b=t[0]  #this is just to handle nonsense with tuples
-        chillDatesWithSnowShield=[]
-        for k in range(len(t[0])): #for each date where there is snow
-            #see if the date for the yeah snow code is within the desired range
-            thisDate=thisPoleData[b[k],11]
-            if winterStart <=thisDate and thisDate <= winterEnd:
-               # print("thisDate: ", thisDate)
-                chillDatesWithSnowShield.append(thisDate)
-                
-        
-        #if the pole never froze over or the data is just missing--hard code in zeros
-        if len(chillDatesWithSnowShield) !=0:
-            summaryArray[i][16]=chillDatesWithSnowShield[0]
-            summaryArray[i][17]=chillDatesWithSnowShield[-1]
-            summaryArray[i][18]=numOfDays(chillDatesWithSnowShield[0],chillDatesWithSnowShield[-1])
-        else:
-            summaryArray[i][16]=0
-            summaryArray[i][17]=0
-            summaryArray[i][18]=0
-            
-            
-        
+#find the first and last date with snow at each depth at each pole during the winter, all poles and depths in one go
+#if a pole never froze over at a depth or the data is just missing, its dates and duration are zeros
 #make gigantic csv file that has the summary info in it
-summary=pd.DataFrame(summaryArray, columns=summaryNames)
-summary.to_csv(inPath+'summary.csv')
-print("summary.csv has been created.")
+with measureStage(report, 'summary', len(depths)):
+    summary=summarizeWinter(depths, poleList, winterStart, winterEnd)
+summaryArray=summary.to_numpy()
+with measureStage(report, 'writesummary', len(summary)):
+    writeTable(summary, inPath+'summary', outputFormat)
+print("summary.%s has been created." %outputFormat)
+
+#the same summary for every winter at once, one row per pole per season
+with measureStage(report, 'seasonSummary', len(depths)):
+    seasonSummary=summarizeSeasons(depths, poleList, seasonStart)
+with measureStage(report, 'writeseasonSummary', len(seasonSummary)):
+    writeTable(seasonSummary, inPath+'seasonSummary', outputFormat)
+print("seasonSummary.%s has been created." %outputFormat)
+
+#the summary counts everything between the first and last snow date as covered, even when it thawed in between. 
+#snowPeriods lists every separate stretch of snow cover instead, and coverageTotals adds them up into the days that were 
+#actually covered and the days of thaw, for every pole, height and season
+with measureStage(report, 'snowPeriods', len(depths)):
+    periods=snowPeriods(depths, poleList, seasonStart)
+    coverage=coverageTotals(periods)
+with measureStage(report, 'writesnowPeriods', len(periods)):
+    writeTable(periods, inPath+'snowPeriods', outputFormat)
+with measureStage(report, 'writecoverageTotals', len(coverage)):
+    writeTable(coverage, inPath+'coverageTotals', outputFormat)
+print("snowPeriods.%s and coverageTotals.%s have been created." %(outputFormat, outputFormat))
+
+#save the run report: the time, rows and memory of every step above
+finishReport(report, reportFile)
+print("The run report has been saved.")
       
 
 
 
 
-#function that gets a yyyymmdd into a python datetime variable
-#theFloatandtheFurious must be a float of the date in question with four digits for the year
+#function that gets yyyymmdd dates into dates matplotlib can plot, a whole column at a time
+#theFloatandtheFurious must be floats (or an array of them) of the dates in question with four digits for the year
 #two digits for the month and two digits for the day
 #if you've got single digit numbers (it Jan 1, it must be 0101 and not 11)
-#returns date1, which is a datetime variable (more info on those for the curiously-minded is available in the Python resources of the README section)
+#returns numpy datetime64 dates (more info on those for the curiously-minded is available in the Python resources of the README section). 
+#zero dates come back blank (NaT) and are just left off of plots
 
 def mrSandManMakeMeSomeSand(theFloatandtheFurious):
-    
-        date1=date(int(str(theFloatandtheFurious)[0:4]), int(str(theFloatandtheFurious)[4:6]), int(str(theFloatandtheFurious)[6:8]))
-        return date1
+        dates=ymdToDays(theFloatandtheFurious).astype('datetime64[D]')
+        return dates
 
 miniA, miniB, miniC, miniD =np.min(summaryArray[:,7]), np.min(summaryArray[:,10]), np.min(summaryArray[:,13]),np.min(summaryArray[:,16]) #first date that there is snow anywhere on the ground
-elevations025, elevations05, elevations1, elevationsS = [],[],[],[] #itialize blanks to later be filled
 maxiA=np.max(summaryArray[:,8]) #the last day that there was snow at 025 meters anywhere in the basin
-startDates025=[] #more initialization
 #for each pole in the pole list, figure out the range based on the start date and duration, this is just cutting them up to get it right for plotting
-for i in range(len(poleList)):
-    elevations025.append(numOfDays(miniA, summaryArray[i,7]))
-    elevations05.append(numOfDays(miniA, summaryArray[i,10]))
-    elevations1.append(numOfDays(miniA, summaryArray[i,13]))
-    elevationsS.append(numOfDays(miniA, summaryArray[i,16]))
-    
-    #get dates in the right order and convert from floats to python datetimes
-    startDates025.append(mrSandManMakeMeSomeSand(summaryArray[i,7]))
+#(every pole at once: numOfDays works on whole columns)
+offsets=numOfDays(miniA, summaryArray[:,[7,10,13,16]])
+elevations025, elevations05, elevations1, elevationsS=offsets.T
+
+#get dates in the right order and convert from floats to dates
+startDates025=mrSandManMakeMeSomeSand(summaryArray[:,7])
 
 
 
@@ -914,19 +771,18 @@ todaysDay=16
 todaysMonth=12
 todaysYear=2020
 
-#pull the information on the desired day from the depths array
-#pole number line excludes any info where the pole was damaged (in this case it was pole 2 and my error
-#exclusion stuff results in a zero in the PN for that)
-today=depths.loc[(depths['DataYear']==float(todaysYear)) & (depths['DataMonth']==float(todaysMonth)) 
-                      & (depths['DataDay']==float(todaysDay)) &(depths['PoleNumber']!=float(0))]
-todaysData=today.to_numpy()
+#pull the information on the desired day out of the cube (one row per pole)
+#the depth line leaves out the poles without any data on that day, and the pole number line excludes any info where the 
+#pole was damaged (in this case it was pole 2 and my error exclusion stuff results in a zero in the PN for that)
+today=snowCube.onDate(todaysYear*10000+todaysMonth*100+todaysDay)
+today=today.loc[today['depth'].notna() & (today['PoleNumber']!=float(0))]
 
 
 
 #this plot is the snow depth on a particular date (the one you define above) as a function of latitude and longitude
 #the color indicates the snow depth
 plt.figure(60)
-plt.scatter(todaysData[:,4],todaysData[:,5],c=todaysData[:,10], cmap='Oranges') #this plots lat on the x axis, long on the y and the color (c) is depth
+plt.scatter(today['latitude'],today['longitude'],c=today['depth'], cmap='Oranges') #this plots lat on the x axis, long on the y and the color (c) is depth
 plt.xlabel("latitude")
 plt.ylabel("longitude")
 plt.title("snow depth on %d\%d\%d" %(todaysMonth, todaysDay, todaysYear))
@@ -940,7 +796,7 @@ ax = plt.axes(projection="3d")
 ax.set_xlabel('lat')
 ax.set_ylabel('long')
 ax.set_zlabel("ele")
-im=ax.scatter(todaysData[:,4],todaysData[:,5],todaysData[:,12], c=todaysData[:,10], cmap='Oranges') #plt. scatter in 3d does (x,y,z) position followed by the color variable
+im=ax.scatter(today['latitude'],today['longitude'],today['elevation'], c=today['depth'], cmap='Oranges') #plt. scatter in 3d does (x,y,z) position followed by the color variable
 ax.view_init(10, 45)
 plt.xlim(58.047, 58.06)
 plt.ylim(-135.38, -135.43)
@@ -948,6 +804,25 @@ plt.title("snow depth on %d\%d\%d" %(todaysMonth, todaysDay, todaysYear))
 fig.colorbar(im, ax=ax)
 plt.show()
 
+#snow depth all over the basin instead of just at the poles, for every day of the winter in one go: the depths at the poles 
+#are spread over a grid with inverse distance weighting (see interpolation.py), and depthMaps has one map per day. Give 
+#basinMaps height=0.5 (for example) to map the chance of at least that much snow instead of the depth.
+#CHANGE ME: if you have the elevation of every grid point (a DEM resampled onto gridLat and gridLon, in the same units as 
+#Poles.csv), pass it as gridElevation=yourGrid so higher ground gets more snow than the poles around it would give it
+mapDates, gridLat, gridLon, depthMaps=basinMaps(snowCube, winterStart, winterEnd)
+#the maps only cover the days of the winter that there's data for, so find today in mapDates (if it's there)
+mapDay=np.flatnonzero(mapDates==np.datetime64('%04d-%02d-%02d' %(todaysYear, todaysMonth, todaysDay)))
+if len(mapDay)==0:
+    print("There's no basin map for %d\%d\%d, the maps run from %s to %s." %(todaysMonth, todaysDay, todaysYear, mapDates[0], mapDates[-1]))
+else:
+    plt.figure(62)
+    plt.pcolormesh(gridLat, gridLon, depthMaps[mapDay[0]].T, cmap='Oranges', shading='auto')
+    plt.scatter(today['latitude'], today['longitude'], c='k', marker='1') #the poles
+    plt.xlabel("latitude")
+    plt.ylabel("longitude")
+    plt.title("estimated snow depth on %d\%d\%d" %(todaysMonth, todaysDay, todaysYear))
+    plt.colorbar(label='snow depth (meters)')
+
 
 
 
@@ -959,11 +834,9 @@ plt.show()
 #depth as a function of time for an individal pole
 #CHANGE ME: desiredPole is the pole number of whichever pole you want to look at
 desiredPole=12
-thisPoleData=depths.loc[depths['PoleNumber']==float(desiredPole)]
-pole1=thisPoleData.to_numpy()
 plt.figure(61)
-plt.plot(pole1[:,10], linestyle='', marker='1', color=colors[2])
-plt.xlabel("logger day")
+plt.plot(snowCube.dates, snowCube.depth[snowCube.poleSlot(desiredPole)], linestyle='', marker='1', color=colors[2])
+plt.xlabel("date")
 plt.ylabel("snow depth (meters)")
 plt.title('snow depth as a function of time')
 
@@ -972,36 +845,9 @@ plt.title('snow depth as a function of time')
 
 
 
-#depth as a function of time for all poles
-
+#depth as a function of time for all poles: the snowCoverageProfile pngs are made along with the temperature profiles in 
+#Section Five (see coverageProfile in plots.py)
 poleList=[1,3,4,5,6,7,8,9,10,11,12,13,14] #poles of interest
-for i in range(len(poleList)):
-    
-    thisPole=poleList[i] #crop data to just be an individual pole for the moment
-    today=depths.loc[depths['PoleNumber']==float(thisPole)]
-    todaysData=today.to_numpy()
-    
-  
-    d=todaysData[:,10] #cut out depth row
-    for j in range(len(d)):
-        if d[j]>1.5:
-            d[j]=1.4
-    
-    #colormap information, this makes it orange
-    #the only logical color for snow
-    cmap=plt.get_cmap("Oranges")
-    colors=cmap([0.25,0.5,0.75,1])
-    
-    
-    plt.figure(thisPole+60)
-    plt.plot(d, linestyle='',marker='1', color=colors[2])
-    plt.xlabel("Date")
-    plt.ylabel("Sensor Coverage (meters)")
-    plt.title("Snow Coverage as a function of time for Pole %d" %thisPole)
-    xtick=[0,75,150,225,300]
-    xlabels=['Oct. 2020', 'Dec. 2020','Feb. 2021','Apr. 2021', 'Jun. 2021']
-    plt.xticks(xtick,xlabels)
-    plt.savefig(inPath+'snowCoverageProfile'+str(thisPole)+'.png')
     
     
 
@@ -1009,14 +855,9 @@ m=np.array([4,10,13,5,11,9,6,12,3,14,8,1,7])
 va=[]
 for i in range(len(m)):
     thisPole=m[i]
-    today=depths.loc[depths['PoleNumber']==float(thisPole)]
-    todaysData=today.to_numpy()
-    
-  
-    d=todaysData[:,10]
-    for j in range(len(d)):
-        if d[j]>1.5:
-            d[j]=1.4
+    d=snowCube.depth[snowCube.poleSlot(thisPole)]
+    d=d[~np.isnan(d)]
+    d=np.where(d>1.5, 1.4, d)
 
     v=np.var(d)
     va.append(v)
@@ -1040,13 +881,8 @@ for i in range(len(m)):
 #last date and duration of snow fall/coverage (in that order) on individual plots
 #run each plotting segment individually in the terminal
 
-q=[]
-asd=[]
-for i in range(len(poleList)):
-    qwerty=mrSandManMakeMeSomeSand(summaryArray[i,7])
-    asdf=mrSandManMakeMeSomeSand(summaryArray[i,8])
-    q.append(qwerty)
-    asd.append(asdf)
+q=mrSandManMakeMeSomeSand(summaryArray[:,7])
+asd=mrSandManMakeMeSomeSand(summaryArray[:,8])
 
 #looking at the date of first snow as a fucntion of elevation
 #no super strong relationship
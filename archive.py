@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+A binary archive of the hourly temperatures, so later work can get at any sensor and any
+stretch of time without reading CombinedData.csv (or the HOBO exports) all over again.
+
+The archive is a folder with one file per sensor (its serial number followed by .f32) and an
+index.json. Each sensor's file is nothing but its temperatures (F) as 32 bit floats, one per
+hour, back to back from its first hour to its last, with nan for any hour without a reading.
+Blank cells in the HOBO exports (the -100 that cleanReadings puts in) don't count as readings.
+index.json says where each sensor's hours start and how many there are, along with the
+sensor's pole information (the same columns as sensors/CombinedData).
+
+Readings go on the hour they were taken in (the same clock as CombinedData). A sensor that
+logs more often than once an hour gets the average of the readings in each hour.
+
+appendToArchive adds the readings from a run to the archive: new sensors get a new file, and
+sensors that are already in it get their file extended to cover the new hours. Readings for
+hours that are already in the archive replace what was there, so processing the same files
+again doesn't change anything.
+
+openArchive only reads index.json. A sensor's file is memory mapped the first time it's asked
+for, so slices of it are read straight off the disk by the operating system as they're used
+instead of being loaded (or copied) up front:
+
+    hourly=openArchive('CSVFilesArchive')
+    hourly.sensors                                      #the index as a data frame
+    times, temps=hourly.readSensor(20503421, 20201201, 20201231)    #December 2020
+
+Use it from the same directory as functions.py.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+from functions import sensorNames, ymdToDays
+
+
+#version of the archive layout, written into index.json
+archiveVersion=1
+
+#minutes in each slot of the time axis
+minutesPerHour=60
+
+#the temperature cleanReadings gives a blank cell in the HOBO exports
+blankReading=-100
+
+
+"""
+appendToArchive
+-----------------------------------------------------------------
+adds every sensor's readings to the archive, one sensor at a time. Blank readings (-100 from
+cleanReadings) are left out
+
+inputs:
+    archiveDir (string): the archive folder. It's made if it doesn't exist yet
+    sensors (data frame): sensor information from stackRecords
+    measurements (data frame): every reading from stackRecords
+outputs:
+    index (dictionary): the archive's index after the readings were added, the same as what's
+        saved in index.json
+"""
+
+def appendToArchive(archiveDir, sensors, measurements):
+    os.makedirs(archiveDir, exist_ok=True)
+    index=readIndex(archiveDir)
+
+    #line each sensor's readings up together, then handle one sensor at a time
+    keys=measurements['sensorKey'].to_numpy()
+    order=np.argsort(keys, kind='stable')
+    keys=keys[order]
+    hours=measurements['time'].to_numpy()[order].astype(np.int64)//minutesPerHour
+    temps=measurements['Temperature'].to_numpy()[order].astype(np.float32)
+    #blank readings are left out, so an hour with nothing else in it stays nan
+    kept=temps!=blankReading
+    keys, hours, temps=keys[kept], hours[kept], temps[kept]
+    bounds=np.searchsorted(keys, np.arange(len(sensors)+1))
+
+    for key, sensor in enumerate(sensors.itertuples(index=False)):
+        sensorHours, sensorTemps=hourlyReadings(hours[bounds[key]:bounds[key+1]], temps[bounds[key]:bounds[key+1]])
+        if len(sensorHours)==0:
+            continue
+        serial=str(int(sensor.SerialNumber))
+        entry=index['sensors'].get(serial, {'file': serial+'.f32', 'startHour': int(sensorHours[0]), 'hours': 0})
+        entry.update({name: float(value) for name, value in zip(sensorNames, sensor)})
+        index['sensors'][serial]=writeSensor(archiveDir, entry, sensorHours, sensorTemps)
+
+    writeIndex(archiveDir, index)
+    return index
+
+
+"""
+hourlyReadings
+-----------------------------------------------------------------
+puts one sensor's readings on the hourly time axis: in order of time, and averaged if there's
+more than one in an hour
+
+inputs:
+    hours (array of ints): the hour each reading was taken in (hours since 1970)
+    temps (array of float32s): the readings
+outputs:
+    hours (array of ints): every hour with a reading, in order
+    temps (array of float32s): the reading (or average) for each of those hours
+"""
+
+def hourlyReadings(hours, temps):
+    order=np.argsort(hours, kind='stable')
+    hours, temps=hours[order], temps[order]
+    if len(hours)>1 and (hours[1:]==hours[:-1]).any():
+        byHour=pd.Series(temps.astype(np.float64)).groupby(hours).mean()
+        hours, temps=byHour.index.to_numpy(), byHour.to_numpy().astype(np.float32)
+    return hours, temps
+
+
+"""
+writeSensor
+-----------------------------------------------------------------
+writes one sensor's hourly readings into its file, growing the file (with nan) if the
+readings start before or end after what's already there
+
+inputs:
+    archiveDir (string): the archive folder
+    entry (dictionary): the sensor's entry in the index
+    hours (array of ints): hours with readings, in order (from hourlyReadings)
+    temps (array of float32s): the reading for each of those hours
+outputs:
+    entry (dictionary): the sensor's entry, with startHour and hours updated
+"""
+
+def writeSensor(archiveDir, entry, hours, temps):
+    path=os.path.join(archiveDir, entry['file'])
+    start=entry['startHour']
+    end=start+entry['hours']
+    newStart=min(start, int(hours[0]))
+    newEnd=max(end, int(hours[-1])+1)
+
+    if entry['hours']==0 or newStart<start:
+        #starting earlier (or a new sensor) means the whole file gets rewritten with the old hours moved over
+        block=np.full(newEnd-newStart, np.nan, dtype=np.float32)
+        if entry['hours']:
+            block[start-newStart:end-newStart]=np.fromfile(path, dtype=np.float32)
+        block.tofile(path)
+    elif newEnd>end:
+        with open(path, 'ab') as f:
+            np.full(newEnd-end, np.nan, dtype=np.float32).tofile(f)
+
+    hourly=np.memmap(path, dtype=np.float32, mode='r+', shape=(newEnd-newStart,))
+    hourly[hours-newStart]=temps
+    hourly.flush()
+    del hourly
+
+    entry['startHour']=newStart
+    entry['hours']=newEnd-newStart
+    return entry
+
+
+"""
+readIndex
+-----------------------------------------------------------------
+reads an archive's index.json, or starts a new empty index if there isn't one
+
+inputs:
+    archiveDir (string): the archive folder
+outputs:
+    index (dictionary): the version, the layout (dtype and minutes per slot) and one entry per
+        sensor (by serial number) with its file, startHour (hours since 1970), number of hours
+        and pole information
+"""
+
+def readIndex(archiveDir):
+    indexPath=os.path.join(archiveDir, 'index.json')
+    if not os.path.exists(indexPath):
+        return {'version': archiveVersion, 'dtype': 'float32', 'minutesPerSlot': minutesPerHour, 'sensors': {}}
+    with open(indexPath) as f:
+        index=json.load(f)
+    if index.get('version')!=archiveVersion:
+        raise ValueError("%s was made by a different version of archive.py (version %s, this is version %d)"
+                         %(indexPath, index.get('version'), archiveVersion))
+    return index
+
+
+"""
+writeIndex
+-----------------------------------------------------------------
+saves an archive's index.json. It's written to a temporary file first and then swapped in,
+so a run that's stopped halfway never leaves a broken index behind
+
+inputs:
+    archiveDir (string): the archive folder
+    index (dictionary): from readIndex
+outputs:
+    none
+"""
+
+def writeIndex(archiveDir, index):
+    indexPath=os.path.join(archiveDir, 'index.json')
+    with open(indexPath+'.tmp', 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(indexPath+'.tmp', indexPath)
+
+
+"""
+openArchive
+-----------------------------------------------------------------
+opens an archive for reading. Only index.json is read, so this takes about the same time
+however many years of data are in the archive
+
+inputs:
+    archiveDir (string): the archive folder
+outputs:
+    hourly (HourlyArchive): the open archive
+"""
+
+def openArchive(archiveDir):
+    hourly=HourlyArchive(archiveDir, readIndex(archiveDir))
+    return hourly
+
+
+"""
+HourlyArchive
+-----------------------------------------------------------------
+an open archive (see the top of this file). Made by openArchive
+
+attributes:
+    archiveDir (string): the archive folder
+    sensors (data frame): one row per sensor, labelled by serial number, with the rest of the
+        columns in sensorNames plus startHour and hours
+"""
+
+class HourlyArchive:
+
+    def __init__(self, archiveDir, index):
+        self.archiveDir=archiveDir
+        self._index=index['sensors']
+        self._arrays={}
+        self.sensors=pd.DataFrame.from_dict(index['sensors'], orient='index',
+                                            columns=sensorNames+['startHour','hours'])
+        #the serial number labels the rows, so it isn't kept as a column as well
+        self.sensors=self.sensors.drop(columns='SerialNumber')
+        self.sensors.index=self.sensors.index.astype(np.int64)
+        self.sensors.index.name='SerialNumber'
+
+
+    """
+    temperatures
+    -----------------------------------------------------------------
+    every hour of one sensor, memory mapped (read only). Nothing is read from the disk until
+    parts of it are used
+
+    inputs:
+        serial (int): the sensor's serial number
+    outputs:
+        temps (array of float32s): one temperature (F) per hour from the sensor's first hour,
+            nan where there's no reading
+    """
+
+    def temperatures(self, serial):
+        serial=str(int(serial))
+        if serial not in self._arrays:
+            entry=self._index[serial]
+            path=os.path.join(self.archiveDir, entry['file'])
+            self._arrays[serial]=np.memmap(path, dtype=np.float32, mode='r', shape=(entry['hours'],))
+        return self._arrays[serial]
+
+
+    """
+    readSensor
+    -----------------------------------------------------------------
+    one sensor over a range of dates. The temperatures are a slice of the memory mapped file,
+    not a copy, so asking for a few days out of several years only ever reads those days
+
+    inputs:
+        serial (int): the sensor's serial number
+        start (int): optional, first date to include in the yyyymmdd format. None starts at the
+            sensor's first hour
+        end (int): optional, last date to include (all of its hours). None goes to the last hour
+    outputs:
+        times (array of datetime64): the hour of each temperature
+        temps (array of float32s): the temperature (F) for each hour, nan where there's no reading
+    """
+
+    def readSensor(self, serial, start=None, end=None):
+        temps=self.temperatures(serial)
+        startHour=self._index[str(int(serial))]['startHour']
+        first=0 if start is None else int(ymdToDays(start))*24-startHour
+        last=len(temps) if end is None else (int(ymdToDays(end))+1)*24-startHour
+        first, last=min(max(first, 0), len(temps)), min(max(last, 0), len(temps))
+        times=(startHour+np.arange(first, last)).astype('datetime64[h]')
+        return times, temps[first:last]
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Timing checks for the processing code. Nothing in here is needed to process your data,
+it's just a way to see how long the slow parts take and make sure they stay fast as the
+code changes.
+
+Run it from the same directory as functions.py:
+    python benchmarks.py                       times every stage on made up data (see synthetic.py)
+    python benchmarks.py --scales small large  the same for just those sizes (see scales below)
+    python benchmarks.py stacking              the old append against stackFrames comparison
+
+Every pipeline run adds a line to benchmarkResults.jsonl (one JSON record per size, with the
+seconds each stage took, the code version and the package versions) and points out any stage
+that got noticeably slower than the last record for the same size.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from functions import (stackFrames, elevationsByPole, writeCombinedData, fusedDailyAverages,
+                       readTable, combinedNames)
+from synthetic import makeSyntheticData
+from instrumentation import startReport, measureStage, finishReport
+import pipeline
+
+
+"""
+fakeSensorFrames
+-----------------------------------------------------------------
+makes a list of data frames shaped like the ones createArray returns, one per sensor file,
+so that joining them can be timed without having any real files around
+
+inputs:
+    numFiles (int): how many sensor files to pretend there are
+    rows (int): number of hourly measurements in each file
+outputs:
+    frames (list of data frames): one frame per pretend file
+"""
+
+def fakeSensorFrames(numFiles, rows):
+    rng=np.random.default_rng(0)
+    frames=[]
+    for i in range(numFiles):
+        frames.append(pd.DataFrame(rng.random((rows,len(combinedNames))), columns=combinedNames))
+    return frames
+
+
+"""
+benchStacking
+-----------------------------------------------------------------
+times building the combined frame the old way (appending one file at a time) against
+stackFrames for a few different numbers of files. If the time per file stays flat as
+the number of files goes up, it's scaling linearly.
+
+inputs:
+    fileCounts (list of ints): the numbers of files to try
+    rows (int): number of hourly measurements in each file
+outputs:
+    results (data frame): number of files and the seconds each method took, total and per file
+"""
+
+def benchStacking(fileCounts=(50,100,200,400), rows=1000):
+    results=[]
+    for numFiles in fileCounts:
+        frames=fakeSensorFrames(numFiles, rows)
+
+        #the old way: glue each file onto everything collected so far
+        start=time.perf_counter()
+        largeFrame=pd.DataFrame(columns=combinedNames)
+        for myDF in frames:
+            largeFrame=pd.concat([largeFrame, myDF]) if len(largeFrame) else myDF
+        appendTime=time.perf_counter()-start
+
+        #the new way: collect them and join once
+        start=time.perf_counter()
+        largeFrame=stackFrames(frames, combinedNames)
+        stackTime=time.perf_counter()-start
+
+        results.append([numFiles, appendTime, stackTime, appendTime/numFiles, stackTime/numFiles])
+        print("%d files: append %.3f s (%.2f ms/file), stackFrames %.3f s (%.2f ms/file)"
+              %(numFiles, appendTime, 1000*appendTime/numFiles, stackTime, 1000*stackTime/numFiles))
+
+    return pd.DataFrame(results, columns=['files','appendSeconds','stackSeconds','appendPerFile','stackPerFile'])
+
+
+#sizes of made up data the pipeline is timed on: number of poles, years of readings and minutes
+#between readings (4 sensors per pole)
+scales={'small': {'poles': 4, 'years': 0.5, 'intervalMinutes': 60},
+        'medium': {'poles': 15, 'years': 1, 'intervalMinutes': 60},
+        'large': {'poles': 40, 'years': 2, 'intervalMinutes': 30}}
+
+#a stage has to be this much slower than last time (and take at least minSeconds) to get pointed out
+slowerBy=1.2
+minSeconds=0.1
+
+#the winter the summary is timed on: the first year of the made up data
+winterStart=20201001
+winterEnd=20210930
+
+
+"""
+benchPipeline
+-----------------------------------------------------------------
+makes a data set of each size with synthetic.py and times every stage of pipeline.py on it
+(plus fusedDailyAverages, writing CombinedData and reading it back). Making the data isn't
+timed. The results are printed, added to the results file, and compared to the last run of
+the same size in that file.
+
+inputs:
+    scaleNames (list of strings): which of the sizes in scales to run
+    resultsFile (string): JSON lines file the results are added to. None doesn't save them
+    workers (int): number of processes used to read the files and draw plots
+    makePlots (bool): also time drawing the per-pole plots
+    workDir (string): optional, folder for the made up data and outputs. None uses a 
+        temporary folder that's deleted afterwards
+outputs:
+    records (list of dictionaries): one result record per size
+"""
+
+def benchPipeline(scaleNames=('small','medium'), resultsFile='benchmarkResults.jsonl', workers=1,
+                  makePlots=False, workDir=None):
+    temporary=None
+    if workDir is None:
+        temporary=tempfile.TemporaryDirectory()
+        workDir=temporary.name
+
+    records=[]
+    for name in scaleNames:
+        scale=scales[name]
+        scaleDir=os.path.join(workDir, name)
+        dataDir, poleFile=makeSyntheticData(scaleDir, poles=scale['poles'], years=scale['years'],
+                                            intervalMinutes=scale['intervalMinutes'])
+        outPrefix=os.path.join(scaleDir, 'bench')
+        report=startReport(traceMemory=False)
+        with measureStage(report, 'ingest', quiet=True):
+            registry, sensors, measurements=pipeline.runIngest(dataDir, poleFile, workers)
+        poleList=sorted(elevationsByPole(registry))
+        with measureStage(report, 'writeCombined', quiet=True):
+            writeCombinedData(sensors, measurements, outPrefix+'CombinedData')
+        with measureStage(report, 'readCombined', quiet=True):
+            readTable(outPrefix+'CombinedData.csv')
+        with measureStage(report, 'daily', quiet=True):
+            dailyAverages=pipeline.runDaily(sensors, measurements)
+        with measureStage(report, 'fusedDaily', quiet=True):
+            fusedDailyAverages([os.path.join(dataDir, f) for f in os.listdir(dataDir)], dataDir, registry, workers)
+        with measureStage(report, 'depths', quiet=True):
+            poleDepths=pipeline.runDepths(dailyAverages, registry, poleList)
+        with measureStage(report, 'summary', quiet=True):
+            pipeline.runSummary(poleDepths, poleList, winterStart, winterEnd)
+        if makePlots:
+            with measureStage(report, 'plots', quiet=True):
+                pipeline.runPlots(dailyAverages, poleDepths, poleList, outPrefix, workers)
+        timings={stage['stage']: stage['seconds'] for stage in finishReport(report)['stages']}
+
+        record={'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'version': codeVersion(), 'scale': name,
+                'sensors': len(sensors), 'readings': len(measurements), 'workers': workers,
+                'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                'seconds': timings, 'readingsPerSecond': len(measurements)/timings['ingest']}
+        records.append(record)
+        print("%s (%d sensors, %d readings): " %(name, len(sensors), len(measurements))
+              +', '.join('%s %.2f s' %(stage, seconds) for stage, seconds in timings.items()))
+
+        if resultsFile is not None:
+            previous=lastRecord(resultsFile, name)
+            if previous is not None:
+                for stage, seconds in timings.items():
+                    before=previous['seconds'].get(stage)
+                    if before and seconds>slowerBy*before and seconds>=minSeconds:
+                        print("    %s is %.0f%% slower than last time (%.2f s, was %.2f s at %s)"
+                              %(stage, 100*(seconds/before-1), seconds, before, previous['version']))
+            with open(resultsFile, 'a') as f:
+                f.write(json.dumps(record)+'\n')
+
+    if temporary is not None:
+        temporary.cleanup()
+    return records
+
+
+"""
+lastRecord
+-----------------------------------------------------------------
+the most recent record for a size in a results file
+
+inputs:
+    resultsFile (string): the JSON lines file
+    name (string): the size
+outputs:
+    record (dictionary): the last record for that size, None if there isn't one
+"""
+
+def lastRecord(resultsFile, name):
+    record=None
+    if os.path.exists(resultsFile):
+        with open(resultsFile) as f:
+            for line in f:
+                if line.strip():
+                    entry=json.loads(line)
+                    if entry.get('scale')==name:
+                        record=entry
+    return record
+
+
+"""
+codeVersion
+-----------------------------------------------------------------
+the git commit the code is at (with a + if there are uncommitted changes), or 'unknown' 
+outside of git, so each result can be matched to the code that made it
+"""
+
+def codeVersion():
+    here=os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit=subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here, capture_output=True, 
+                              text=True, check=True).stdout.strip()
+        changed=subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here, 
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit+('+' if changed else '')
+
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description="Time the snow pole processing on made up data.")
+    parser.add_argument('which', nargs='?', choices=['pipeline','stacking'], default='pipeline')
+    parser.add_argument('--scales', nargs='+', choices=list(scales), default=['small','medium'])
+    parser.add_argument('--results', default='benchmarkResults.jsonl', help="JSON lines file to add the results to")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--plots', action='store_true', help="also time drawing the plots")
+    args=parser.parse_args()
+    if args.which=='stacking':
+        benchStacking()
+    else:
+        benchPipeline(args.scales, args.results, args.workers, args.plots)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Every pole's daily results in one place: a SnowCube holds the daily temperature, variance and
+snow code as dense numpy arrays with one slot per pole, per calendar day and per sensor height
+(and the snow depth with one slot per pole and day). Days with no data are blank (nan).
+
+Because every pole, day and height has a fixed slot, getting everything for one date, one pole
+or one height is just indexing into the arrays, no matter how many rows the data has, instead
+of searching the whole dailyAverages or depths frame again each time:
+
+    snowCube=buildCube(dailyAverages, depths, poleList)
+    snowCube.onDate(20201216)          #every pole on December 16th 2020 (a data frame)
+    snowCube.forPole(12)               #every day at pole 12 (a data frame)
+    snowCube.atHeight(0.25)            #the 0.25 m sensors, every pole and day (arrays)
+    snowCube.depth[snowCube.poleSlot(12)]    #or go straight to the arrays
+
+Use it from the same directory as functions.py.
+"""
+import numpy as np
+import pandas as pd
+from functions import ymdToDays, daysToYmd
+
+
+"""
+buildCube
+-----------------------------------------------------------------
+fills a SnowCube from the daily results, in one pass over each table
+
+inputs:
+    dailyAverages (data frame): daily averages built by makeDailyAverages (or read back in with
+        readTable). PoleNumber, Height, EpochDay, Temperature, dailyVariance, snowNoSnow,
+        latitude and longitude are used
+    depths (data frame): optional, snow depths built by codeDepths, for the depth and the pole
+        elevations. None leaves them blank
+    poleList (list): optional, the poles to include, in order. None uses every pole in
+        dailyAverages, in order of pole number
+outputs:
+    snowCube (SnowCube): the cube. Days run from the first to the last day in dailyAverages,
+        heights are every sensor height in it from lowest to highest. If a pole has two
+        sensors at the same height, the one that comes last in dailyAverages is kept
+"""
+
+def buildCube(dailyAverages, depths=None, poleList=None):
+    if poleList is None:
+        poleList=sorted(dailyAverages['PoleNumber'].unique())
+    poles=np.asarray(poleList, dtype=float)
+    daily=dailyAverages.loc[dailyAverages['PoleNumber'].isin(poles)]
+    heights=np.sort(daily['Height'].unique())
+    firstDay=int(daily['EpochDay'].min()) if len(daily) else 0
+    days=int(daily['EpochDay'].max())-firstDay+1 if len(daily) else 0
+
+    snowCube=SnowCube(poles, firstDay, days, heights)
+    p=snowCube.poleSlot(daily['PoleNumber'].to_numpy())
+    d=daily['EpochDay'].to_numpy().astype(np.int64)-firstDay
+    h=np.searchsorted(heights, daily['Height'].to_numpy())
+    snowCube.temperature[p,d,h]=daily['Temperature'].to_numpy()
+    snowCube.variance[p,d,h]=daily['dailyVariance'].to_numpy()
+    snowCube.snow[p,d,h]=daily['snowNoSnow'].to_numpy()
+
+    #latitude and longitude from each pole's first daily row, elevation from depths
+    info=daily.groupby('PoleNumber')[['latitude','longitude']].first().reindex(poles)
+    snowCube.latitude[:]=info['latitude'].to_numpy()
+    snowCube.longitude[:]=info['longitude'].to_numpy()
+
+    if depths is not None:
+        rows=depths.loc[depths['PoleNumber'].isin(poles)]
+        d=rows['EpochDay'].to_numpy().astype(np.int64)-firstDay
+        inRange=(d>=0) & (d<days)
+        rows, d=rows.loc[inRange], d[inRange]
+        snowCube.depth[snowCube.poleSlot(rows['PoleNumber'].to_numpy()), d]=rows['depth'].to_numpy()
+        elevations=rows.groupby('PoleNumber')['elevation'].first().reindex(poles)
+        snowCube.elevation[:]=elevations.to_numpy()
+    return snowCube
+
+
+"""
+SnowCube
+-----------------------------------------------------------------
+the dense daily results (see the top of this file). Made by buildCube
+
+attributes:
+    poles (array): pole number of each pole slot
+    firstDay (int): the day of the first day slot, as days since 1970 (EpochDay)
+    heights (array): sensor height of each height slot (m)
+    temperature, variance, snow (arrays): daily average temperature (F), daily variance and
+        snow code (1 snow, 0 no snow), shape (poles, days, heights)
+    depth (array): snow depth (m), shape (poles, days)
+    latitude, longitude, elevation (arrays): for each pole
+"""
+
+class SnowCube:
+
+    def __init__(self, poles, firstDay, days, heights):
+        self.poles=np.asarray(poles, dtype=float)
+        self.firstDay=firstDay
+        self.heights=np.asarray(heights, dtype=float)
+        shape=(len(self.poles), days, len(self.heights))
+        self.temperature=np.full(shape, np.nan)
+        self.variance=np.full(shape, np.nan)
+        self.snow=np.full(shape, np.nan)
+        self.depth=np.full(shape[0:2], np.nan)
+        self.latitude=np.full(len(self.poles), np.nan)
+        self.longitude=np.full(len(self.poles), np.nan)
+        self.elevation=np.full(len(self.poles), np.nan)
+        self._poleSlots={p:i for i, p in enumerate(self.poles)}
+
+
+    """
+    days
+    -----------------------------------------------------------------
+    the day of every day slot, as days since 1970 (EpochDay)
+    """
+
+    @property
+    def days(self):
+        return self.firstDay+np.arange(self.depth.shape[1])
+
+
+    """
+    dates
+    -----------------------------------------------------------------
+    the date of every day slot as numpy dates, ready to go on a plot axis
+    """
+
+    @property
+    def dates(self):
+        return self.days.astype('datetime64[D]')
+
+
+    """
+    poleSlot
+    -----------------------------------------------------------------
+    which slot a pole is in
+
+    inputs:
+        poleNumber (float or array): pole number(s)
+    outputs:
+        slot (int or array of ints): the slot(s). A pole that isn't in the cube raises a KeyError
+    """
+
+    def poleSlot(self, poleNumber):
+        if np.ndim(poleNumber)==0:
+            return self._poleSlots[float(poleNumber)]
+        slots=pd.Index(self.poles).get_indexer(np.asarray(poleNumber, dtype=float))
+        if (slots<0).any():
+            raise KeyError("pole(s) %s aren't in the cube" %np.unique(np.asarray(poleNumber)[slots<0]))
+        return slots
+
+
+    """
+    daySlot
+    -----------------------------------------------------------------
+    which slot a date is in
+
+    inputs:
+        ymd (int): the date in the yyyymmdd format, e.g. 20201216
+    outputs:
+        slot (int): the slot. A date outside of the cube raises a KeyError
+    """
+
+    def daySlot(self, ymd):
+        slot=int(ymdToDays(ymd))-self.firstDay
+        if not 0<=slot<self.depth.shape[1]:
+            raise KeyError("%d isn't in the cube, which runs from %d to %d"
+                           %(ymd, daysToYmd(self.firstDay), daysToYmd(self.days[-1])))
+        return slot
+
+
+    """
+    heightSlot
+    -----------------------------------------------------------------
+    which slot a sensor height is in
+
+    inputs:
+        height (float): sensor height (m)
+    outputs:
+        slot (int): the slot. A height that isn't in the cube raises a KeyError
+    """
+
+    def heightSlot(self, height):
+        slot=int(np.searchsorted(self.heights, float(height)))
+        if slot==len(self.heights) or self.heights[slot]!=float(height):
+            raise KeyError("there are no %s m sensors in the cube" %height)
+        return slot
+
+
+    """
+    onDate
+    -----------------------------------------------------------------
+    everything at every pole on one date: what Section Six's maps need
+
+    inputs:
+        ymd (int): the date in the yyyymmdd format
+    outputs:
+        today (data frame): one row per pole with PoleNumber, latitude, longitude, elevation,
+            depth and the temperature and snow code of each sensor height (columns named
+            Temperature and snowNoSnow followed by the height)
+    """
+
+    def onDate(self, ymd):
+        day=self.daySlot(ymd)
+        today=pd.DataFrame({'PoleNumber': self.poles, 'latitude': self.latitude, 'longitude': self.longitude,
+                            'elevation': self.elevation, 'depth': self.depth[:,day]})
+        for i, height in enumerate(self.heights):
+            today['Temperature%g' %height]=self.temperature[:,day,i]
+            today['snowNoSnow%g' %height]=self.snow[:,day,i]
+        return today
+
+
+    """
+    forPole
+    -----------------------------------------------------------------
+    everything at one pole on every day: what the per pole profiles need
+
+    inputs:
+        poleNumber (float): the pole
+    outputs:
+        pole (data frame): one row per day with EpochDay, the date in the yyyymmdd format,
+            depth and the temperature, variance and snow code of each sensor height (columns
+            named Temperature, dailyVariance and snowNoSnow followed by the height)
+    """
+
+    def forPole(self, poleNumber):
+        slot=self.poleSlot(poleNumber)
+        pole=pd.DataFrame({'EpochDay': self.days, 'YYYYMMDD': daysToYmd(self.days), 'depth': self.depth[slot]})
+        for i, height in enumerate(self.heights):
+            pole['Temperature%g' %height]=self.temperature[slot,:,i]
+            pole['dailyVariance%g' %height]=self.variance[slot,:,i]
+            pole['snowNoSnow%g' %height]=self.snow[slot,:,i]
+        return pole
+
+
+    """
+    atHeight
+    -----------------------------------------------------------------
+    one sensor height at every pole on every day
+
+    inputs:
+        height (float): sensor height (m)
+    outputs:
+        temperature, variance, snow (arrays): views into the cube, shape (poles, days)
+    """
+
+    def atHeight(self, height):
+        slot=self.heightSlot(height)
+        return self.temperature[:,:,slot], self.variance[:,:,slot], self.snow[:,:,slot]
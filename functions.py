@@ -8,114 +8,1465 @@ import numpy as np
 import csv
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
 import glob
+import re
+import json
+import hashlib
+import warnings
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+
+#patterns used to pick information out of the header lines of a hobo export
+#the serial number is the first long run of digits after "Serial Number", "S/N" or "Plot Title"
+serialPattern=re.compile(r'(?:serial\s*number|s/n|plot\s*title)\W*(\d{6,})', re.IGNORECASE)
+plotTitlePattern=re.compile(r'plot\s*title\s*:\s*([^,"]*)', re.IGNORECASE)
+timeZonePattern=re.compile(r'(GMT\s*[+-]\d\d:?\d\d|\(([A-Z]{2,5})\))')
+unitsPattern=re.compile(r'°\s*([CF])')
 
 """
-createArray
+readHoboChunks
+-----------------------------------------------------------------
+This function reads a csv file exported from the hobo software in a single pass over the file.
+The first two lines of an export are administrative information about the logger (serial number,
+plot title) and the third line names the data columns, which is also where the time zone and
+the temperature units are written. Those lines are read off the top of the file and the rest
+of the same open file is handed straight to pandas, so nothing is read twice.
+
+The data is handed over a piece at a time instead of reading the whole file into memory at 
+once. Each piece is chunkSize rows long (the last one can be shorter), so however big the 
+export is, only one piece of it is in memory at a time. Use it in a for loop:
+    for header, data in readHoboChunks(filePath, 100000):
+        ...
+A file with no readings still gives one (empty) piece, so the header always comes through.
+
+inputs:
+    filePath (string): full path to an individual csv file exported from the hobo software
+    chunkSize (int): number of rows in each piece. None reads the whole file as a single piece
+outputs:
+    (generator) header (dictionary), data (data frame): information pulled out of the header 
+        lines, with the keys serialNumber, plotTitle, timeZone and units, and the next chunkSize 
+        rows of dates (first column) and temperatures (second column). Anything in the header 
+        that can't be found is left as an empty string, except for the serial number, which 
+        raises a ValueError since nothing can be matched without it
+"""
+
+def readHoboChunks(filePath, chunkSize=100000):
+    with open(filePath, newline='', encoding='utf-8-sig') as f:
+        topLines=readTopLines(f)
+        #the rest of the file (column names and data) goes to pandas from where we left off
+        if chunkSize is None:
+            chunks=[pd.read_csv(f, header=0)]
+        else:
+            chunks=pd.read_csv(f, header=0, chunksize=chunkSize)
+        header=None
+        for data in chunks:
+            if header is None:
+                header=parseHoboHeader(topLines, data.columns, filePath)
+            yield header, data
+
+
+"""
+readTopLines
+-----------------------------------------------------------------
+reads the two lines of logger information above the column names off the top of an open 
+hobo export, leaving the file at the column names
+
+inputs:
+    f (file): the export, opened with newline=''
+outputs:
+    topLines (list of strings): the two lines, with their csv fields joined by spaces
+"""
+
+def readTopLines(f):
+    topLines=[' '.join(next(csv.reader([f.readline()]), [])) for i in range(2)]
+    return topLines
+
+
+"""
+parseHoboHeader
+-----------------------------------------------------------------
+picks the serial number, plot title, time zone and units out of the header of a hobo export.
+See readHoboChunks for what each of them looks like
+
+inputs:
+    topLines (list of strings): from readTopLines
+    columns (list of strings): the column names of the data
+    filePath (string): path of the export, the serial number falls back on its name
+outputs:
+    header (dictionary): with the keys serialNumber, plotTitle, timeZone and units
+"""
+
+def parseHoboHeader(topLines, columns, filePath):
+    columns=' '.join(str(c) for c in columns)
+
+    #serial number: look in the logger information first, then the column names (LGR S/N: ...), and
+    #lastly the file name since hobo names its exports after the serial number
+    found=serialPattern.search(' '.join(topLines)) or serialPattern.search(columns) \
+        or re.match(r'(\d{6,})', os.path.basename(filePath))
+    if found is None:
+        raise ValueError("Could not find a serial number in the header of %s" %filePath)
+
+    plotTitle=plotTitlePattern.search(' '.join(topLines))
+    timeZone=timeZonePattern.search(columns)
+    units=unitsPattern.search(columns)
+    header={'serialNumber': found.group(1),
+            'plotTitle': plotTitle.group(1).strip() if plotTitle else '',
+            'timeZone': (timeZone.group(2) or timeZone.group(1)) if timeZone else '',
+            'units': units.group(1) if units else ''}
+    return header
+
+
+#names of the columns of the combined (wide) data frame, one row per reading
+combinedNames=['SerialNumber', 'Height', 'PoleNumber', 'DeployYear', 'DeployMonth','DeployDat','latitude', 
+ 'longitude', 'TrasectNumber', 'DataYear', 'DataMonth', 'DataDay', 'DataHour', 'Temperature']
+#the first nine of those describe the sensor and its pole, and are the same for every reading from a sensor
+sensorNames=combinedNames[0:9]
+
+#times are kept as whole minutes since the start of 1970
+minutesPerDay=24*60
+
+"""
+loadPoles
+-----------------------------------------------------------------
+This function reads the pole information file (Poles.csv) once and turns it into a lookup
+table from serial number to everything known about that sensor, so each data file can find
+its sensor straight away instead of searching the whole spreadsheet. The deployment dates
+(month/day/year) are split into numbers here, once for every sensor.
+
+The columns are read by position, in the order given in the README: serial number, height,
+pole number, deployment date, latitude, longitude, transect number and elevation. Anything to
+the right of those is ignored. If a serial number shows up more than once (a logger that was
+redeployed on another pole, say) the first row it's on is used, with a warning. A deployment
+date that isn't month/day/year raises a ValueError naming the serial number and the date.
+
+inputs:
+    poleFile (string): path of the pole information csv file
+outputs:
+    registry (dictionary): serial number (int) -> dictionary with the keys 'sensor' (the
+        sensor's information as a list of numbers in the order of sensorNames) and 'Elevation'
+
+"""
+
+def loadPoles(poleFile):
+    poles=pd.read_csv(poleFile)
+    poles=poles[poles.iloc[:,0].notna()]
+    #a serial number listed more than once goes with the first pole it's listed on
+    serials=poles.iloc[:,0].astype(np.int64)
+    repeated=serials.duplicated()
+    if repeated.any():
+        warnings.warn("Serial number(s) %s show up more than once in %s, the first row of each is used"
+                      %(', '.join(str(r) for r in serials[repeated].unique()), poleFile))
+        poles=poles[~repeated]
+    serials=poles.iloc[:,0].astype(np.int64).to_numpy()
+
+    #month, day and year of deployment as numbers
+    dates=poles.iloc[:,3].astype(str).str.strip()
+    bad=~dates.str.fullmatch(r'\d+/\d+/\d+')
+    if bad.any():
+        raise ValueError("Deployment date(s) in %s aren't month/day/year: %s"
+                         %(poleFile, ', '.join('%r for serial number %d' %(date, serial)
+                                               for date, serial in zip(dates[bad], serials[bad.to_numpy()]))))
+    deployed=dates.str.split('/', expand=True).astype(int)
+    info=np.column_stack([poles.iloc[:,0:3].to_numpy(dtype=float),
+                          deployed.to_numpy(dtype=float),
+                          poles.iloc[:,4:7].to_numpy(dtype=float)])
+    if poles.shape[1]>7:
+        elevations=poles.iloc[:,7].to_numpy(dtype=float)
+    else:
+        elevations=np.full(len(poles), np.nan)
+
+    registry={int(serial): {'sensor': row.tolist(), 'Elevation': float(elevation)}
+              for serial, row, elevation in zip(serials, info, elevations)}
+    return registry
+
+
+"""
+elevationsByPole
+-----------------------------------------------------------------
+pulls the elevation of each pole out of the pole registry. Every sensor on a pole should have 
+the same elevation, the first one listed is used.
+
+inputs:
+    registry (dictionary): made by loadPoles
+outputs:
+    elevations (dictionary): pole number -> elevation of that pole
+"""
+
+def elevationsByPole(registry):
+    elevations={}
+    for entry in registry.values():
+        pole=int(entry['sensor'][2])
+        if pole not in elevations:
+            elevations[pole]=entry['Elevation']
+    return elevations
+
+"""
+createRecords
 -----------------------------------------------------------------
 This function takes the name of a file, a file location and a file of administrative
-information on the entire array of poles and creates a new data frame for an individual pole
-by matching serial numbers between the input file and the list of serial numbers 
-in the administrative file
+information on the entire array of poles and pulls out everything recorded by that sensor,
+matching the serial number in the file to the list of serial numbers in the administrative
+file.
 
-don't ask why a function that returns a data frame is called createArray
+Rather than repeating the pole information on every single reading, it's split into two
+pieces: the sensor's information (one row), and the readings themselves, which only need a
+time and a temperature each. The time is a whole number of minutes since the start of 1970
+and the temperature is a 32 bit float (plenty for what the loggers can measure), so each
+reading takes 8 bytes instead of the 112 of a row of the combined frame. The two pieces get
+joined back together (see widenData) only when the combined csv is written.
 
 inputs:
     filename (string): the name of an individaul csv file exported from the hobo software. 
-    don't rename files, just leave them the default manner, as this picks off parts
-    of the name and uses that to match the serial number information
+    the serial number used to match the file to its pole is read from the header inside
+    the file (see readHoboChunks), so the name itself no longer matters
     pathName (string): the path name of where the files are stored
-    polesInfo (np array): directly read in from the spreadsheet that contains the administrative
-        information about the poles (deployment dates, transect number, location, serial number). 
-        check the file itself for more information
+    polesInfo (dictionary): the pole registry made by loadPoles from the spreadsheet that 
+        contains the administrative information about the poles (deployment dates, transect 
+        number, location, serial number). A serial number that isn't in it raises a ValueError
+    chunkSize (int): optional, read the file this many rows at a time (see recordChunks) to 
+        keep memory down on very big exports. None (the default) reads it all at once
     
 outputs:
-    panda (data frame): data frame that describes the deployment information
-        and all recorded data from the four loggers on a pole in a single frame
-    
+    sensor (series): the sensor's information, labelled with sensorNames
+    measurements (data frame): one row per reading with the columns time (int32, minutes
+        since 1970) and Temperature (float32, F)
 
 """
 
-def createArray(filename,pathName, polesInfo):
+def createRecords(filename, pathName, polesInfo, chunkSize=None):
+    sensor=None
+    pieces=[]
+    for sensor, measurements in recordChunks(filename, pathName, polesInfo, chunkSize):
+        pieces.append(measurements)
+    measurements=pd.concat(pieces, ignore_index=True) if len(pieces)>1 else pieces[0]
+    return sensor, measurements
+
+
+"""
+recordChunks
+-----------------------------------------------------------------
+createRecords a piece at a time: the file is read chunkSize rows at a time (see 
+readHoboChunks) and each piece is turned into measurements and handed on before the next one 
+is read. The raw text of a big export takes many times more memory than the 8 bytes per 
+reading it ends up as, so going through it in pieces keeps that overhead down to one piece's 
+worth no matter how long the logger was out.
+
+inputs:
+    filename (string): the name of an individaul csv file exported from the hobo software
+    pathName (string): the path name of where the files are stored
+    polesInfo (dictionary): the pole registry from loadPoles, same as createRecords
+    chunkSize (int): number of rows read at a time. None reads the whole file at once
+outputs:
+    (generator) sensor (series), measurements (data frame): the sensor's information (the 
+        same for every piece) and the measurements for the next piece, as in createRecords
+"""
+
+def recordChunks(filename, pathName, polesInfo, chunkSize=100000):
     myFile=filename
-  #  print("myFile", myFile)
     inPath=pathName
     np_poles=polesInfo
-    #open individual file
-   # df2=pd.read_csv(inPath+myFile, header=1)
-    df2=pd.read_csv(inPath+myFile, header=2)
-    
+    sensor=None
+    #open individual file, this also pulls the serial number out of the header. The serial number
+    #gets matched between the two files
+    for header, df2 in readHoboChunks(os.path.join(inPath, myFile), chunkSize):
+        if sensor is None:
+            serialNumber=header['serialNumber']
 
-    #pull indices
-    df3=df2.T
-   # print(df3.index)
-
-    #pull serial number, this gets matched between the two files
-    #this is why to not change the file names
-    df_headed=pd.read_csv(inPath+myFile)
-    df_headed=df_headed.T
-    serialNumber=(str(df_headed.index)[22:30])
-
-    #reformat pandas info into numpy info
-    b=df2.to_numpy()
-    x,y=np.shape(b)  #dimensions of new numpy array, for personal reference (x--height, y--width)
-
-    #split numpy array to get dates and temperatures of individual mesasurments
-    dates=b[:,0]
-    temperatures=b[:,1]
-    temperatures=np.reshape(temperatures, (x,1))
-  #  print("dates", dates)
-    
+            #match sensor info from data with sensor info from descriptive file
+            poleInfo=np_poles.get(int(serialNumber))
+            if poleInfo is None:
+                raise ValueError("Serial number %s from %s is not in the pole information file" %(serialNumber, myFile))
+
+            #information about the monitors on the poles: serial number, depth, pole number, deployment 
+            #month, day and year, latitude, longitude and transect number
+            sensor=pd.Series(poleInfo['sensor'], index=sensorNames, dtype=float)
 
-    #match sensor info from data with sensor info from descriptive file
-    myFavoriteIndex=np.where(np_poles==int(serialNumber))[0]
-    mI=int(myFavoriteIndex[0])
+        yield sensor, cleanReadings(df2)
 
-    #create dummy array to populate with combined info on the data and poles
-    master=np.zeros((x,14))
 
-    poleInfo=np_poles[mI,:]
-    #information about the monitors on the poles, being repopulated into other array
-    master[:,0]=poleInfo[0]    #serial number
-    master[:,1]=poleInfo[1]    #depth
-    master[:,2]=poleInfo[2]    #pole number
-    depTime=str(poleInfo[3])
-    master[:,3]=int(depTime.split('/')[0])  #pole deployment month
-    master[:,4]=int(depTime.split('/')[1])   #pole deployment day
-    master[:,5]=int(depTime.split('/')[2])  #pole deployment year
-    master[:,6]=poleInfo[4]  #latitude
-    master[:,7]=poleInfo[5] #longitude
-    master[:,8]=poleInfo[6] #transect number
+"""
+cleanReadings
+-----------------------------------------------------------------
+turns the dates and temperatures read from a hobo export (all of it or just a piece) into 
+measurements: minutes since 1970 and temperatures
+
+inputs:
+    df2 (data frame): dates in the first column and temperatures in the second, as read by
+        readHoboChunks
+outputs:
+    measurements (data frame): time (int32, minutes since 1970) and Temperature (float32, F)
+"""
 
+def cleanReadings(df2):
+    #split the data frame to get dates and temperatures of individual mesasurments
+    dates=df2.iloc[:,0].astype(str)
+    temperatures=df2.iloc[:,1]
 
     # date handling for individal data points
-    for i in range(x):
-        theDate=dates[i]
-        master[i,9]=int(dates[i][0:4]) #year
-        master[i,10]=int(dates[i][5:7]) #month
-        master[i,11]=int(dates[i][8:10]) #day
-        master[i,12]=int(dates[i][11:13]) #hour
-        
-        
-        #temperature handling
-        if temperatures[i] == ' ': #if temp is messed up, make number but a weird one
-           # print("you're not in kansas anymore")
-            temperatures[i]=-100
-        #unit conversion and writing back into main array
-        thisTemp=float(temperatures[i])
-        master[i,13]= thisTemp#temperatures, in F
-
-
-    #convert back into dataframe
-    names=['SerialNumber', 'Height', 'PoleNumber', 'DeployYear', 'DeployMonth','DeployDat','latitude', 
-     'longitude', 'TrasectNumber', 'DataYear', 'DataMonth', 'DataDay', 'DataHour', 'Temperature']
-    panda=pd.DataFrame(master, columns=names)
+    #the whole column is parsed in one go (the yyyy-mm-dd hh:mm part of the stamp) and turned into
+    #minutes since 1970
+    stamps=pd.to_datetime(dates.str.slice(0,16), format='%Y-%m-%d %H:%M')
+    minutes=stamps.to_numpy().astype('datetime64[m]').astype(np.int64)
+
+    #temperature handling
+    #if temp is messed up, make number but a weird one
+    temperatures=temperatures.replace(' ', -100)
+
+    measurements=pd.DataFrame({'time': minutes.astype(np.int32),
+                               'Temperature': temperatures.astype(np.float32)}) #temperatures, in F
+    return measurements
+
+
+"""
+createArray
+-----------------------------------------------------------------
+This function takes the name of a file, a file location and a file of administrative
+information on the entire array of poles and creates a new data frame for an individual pole
+by matching serial numbers between the input file and the list of serial numbers 
+in the administrative file. It's createRecords with the pieces joined back into one
+wide frame, for when you want to look at a single file.
+
+don't ask why a function that returns a data frame is called createArray
+
+inputs:
+    filename (string): the name of an individaul csv file exported from the hobo software
+    pathName (string): the path name of where the files are stored
+    polesInfo (dictionary): the pole registry from loadPoles, same as createRecords
+    
+outputs:
+    panda (data frame): data frame that describes the deployment information
+        and all recorded data from the four loggers on a pole in a single frame, with the
+        columns in combinedNames
+    
+
+"""
+
+def createArray(filename,pathName, polesInfo):
+    sensor, measurements=createRecords(filename, pathName, polesInfo)
+    sensors, measurements=stackRecords([(sensor, measurements)])
+    panda=widenData(sensors, measurements)
     
     #return dataframe back to main file
     return panda
 
 
+"""
+stackRecords
+-----------------------------------------------------------------
+This function puts the pieces from createRecords for every file together into two tables: 
+a small one with a row of information for each sensor, and a narrow one with every reading 
+from every sensor. Each sensor gets a small whole number key (its position in the list), 
+which is all that's stored with each of its readings.
+
+inputs:
+    records (list): (sensor, measurements) pairs from createRecords, one per file
+outputs:
+    sensors (data frame): one row per sensor with the columns in sensorNames, labelled by 
+        the sensor's key
+    measurements (data frame): every reading with the columns sensorKey (int16), time and 
+        Temperature, with each sensor's readings kept together in the order of the files
+
+"""
+
+def stackRecords(records):
+    sensors=pd.DataFrame([sensor for sensor, readings in records], columns=sensorNames, dtype=float)
+    sensors.index.name='sensorKey'
+    chunks=[]
+    for key in range(len(records)):
+        readings=records[key][1]
+        chunks.append(pd.DataFrame({'sensorKey': np.full(len(readings), key, dtype=np.int16),
+                                    'time': readings['time'].to_numpy(),
+                                    'Temperature': readings['Temperature'].to_numpy()}))
+    measurements=stackFrames(chunks, ['sensorKey','time','Temperature']).reset_index(drop=True)
+    return sensors, measurements
+
+
+"""
+widenData
+-----------------------------------------------------------------
+This function joins the sensor information back onto each reading to make the combined 
+(wide) frame with one row per reading and the columns in combinedNames. This repeats the 
+pole information on every row, so it's best to only do it a sensor at a time (which is what
+writeCombinedData does) rather than for everything at once.
+
+inputs:
+    sensors (data frame): sensor information from stackRecords
+    measurements (data frame): readings from stackRecords, or any part of them
+outputs:
+    wide (data frame): the combined frame for those readings. The row labels count the 
+        readings of each sensor from 0, same as when each file was its own frame
+
+"""
+
+def widenData(sensors, measurements):
+    keys=measurements['sensorKey'].to_numpy()
+    wide=sensors.loc[keys].reset_index(drop=True)
+    stamps=pd.DatetimeIndex(measurements['time'].to_numpy().astype('datetime64[m]'))
+    wide['DataYear']=stamps.year.astype(float) #year
+    wide['DataMonth']=stamps.month.astype(float) #month
+    wide['DataDay']=stamps.day.astype(float) #day
+    wide['DataHour']=stamps.hour.astype(float) #hour
+    wide['Temperature']=measurements['Temperature'].to_numpy() #temperatures, in F
+    wide.index=pd.Series(keys).groupby(keys).cumcount().to_numpy()
+    return wide
+
+
+"""
+writeCombinedData
+-----------------------------------------------------------------
+This function saves the combined data (CombinedData.csv) from the sensor and measurement 
+tables, one sensor at a time, so the full wide frame is never held in memory all at once.
+
+inputs:
+    sensors (data frame): sensor information from stackRecords
+    measurements (data frame): readings from stackRecords
+    pathStem (string): where to save it, without the file ending (e.g. inPath+'CombinedData')
+    fileFormat (string): 'csv' (the default), 'parquet' or 'feather', same as writeTable
+outputs:
+    filePath (string): the full name of the file that was saved
+
+"""
+
+def writeCombinedData(sensors, measurements, pathStem, fileFormat='csv'):
+    index=buildIndex(measurements, 'sensorKey')
+    chunks=(widenData(sensors, lookupRows(measurements, index, key)) for key in sensors.index if key in index)
+    filePath=writeTable(chunks, pathStem, fileFormat)
+    return filePath
+
+
+"""
+loadFiles
+-----------------------------------------------------------------
+This function runs createRecords on every file in a list. Each file is independent of the 
+others, so they can either be read one after the other or spread across several processes 
+(one per core) to read a big collection faster. Either way the results come back in the same 
+order as the list of files, so everything made from them afterwards is the same.
+
+Running more than one process on Windows or a Mac requires the script that calls this to 
+have its work under an if __name__ == '__main__': line, since each new process re-runs that 
+script when it starts.
+
+If a cache folder is given, the records made from each file are also saved there, and the next 
+time the same file comes through it's loaded straight from the cache instead of being read 
+and processed again. A file is only processed again if it has changed: its size and 
+modification time are checked first, and if either is different the contents are hashed and
+compared against the hash from last time. Changing the pole information (or this code, see 
+cacheVersion) also sends every file back through createRecords.
+
+inputs:
+    fileList (list of strings): paths of the csv files exported from the hobo software
+    pathName (string): the path name of where the files are stored
+    polesInfo (dictionary): the pole registry from loadPoles, same as createRecords
+    workers (int): the number of processes to use. 1 (the default) reads the files one at a 
+        time without starting any new processes, None uses every core on the computer
+    cacheDir (string): optional, folder to keep the cache in. It's made if it doesn't exist.
+        None (the default) doesn't use a cache at all
+    chunkSize (int): optional, read each file this many rows at a time, see createRecords.
+        It doesn't change the results, so cached files are still used when it changes
+outputs:
+    records (list): one (sensor, measurements) pair from createRecords per file, in the same 
+        order as fileList. stackRecords puts them together
+
+"""
+
+def loadFiles(fileList, pathName, polesInfo, workers=1, cacheDir=None, chunkSize=None):
+    fileNames=[os.path.basename(f) for f in fileList]
+    if cacheDir is None:
+        records=parseFiles(fileNames, pathName, polesInfo, workers, chunkSize)
+        return records
+
+    os.makedirs(cacheDir, exist_ok=True)
+    manifestPath=os.path.join(cacheDir, 'manifest.json')
+    manifest={}
+    if os.path.exists(manifestPath):
+        with open(manifestPath) as f:
+            manifest=json.load(f)
+    polesKey=hashlib.sha1((str(cacheVersion)+repr(sorted(polesInfo.items()))).encode()).hexdigest()
+
+    records=[None]*len(fileNames)
+    toParse=[]  #positions in the file list of the files that need processing
+    stats={}
+    for i in range(len(fileNames)):
+        path=os.path.abspath(os.path.join(pathName, fileNames[i]))
+        info=os.stat(path)
+        stats[i]={'size': info.st_size, 'mtime': info.st_mtime_ns}
+        entry=manifest.get(path)
+        if entry is None or entry['poles']!=polesKey or not os.path.exists(os.path.join(cacheDir, entry['file'])):
+            toParse.append(i)
+            continue
+        #same size and modification time, or touched but the contents are the same
+        if (entry['size'], entry['mtime'])!=(info.st_size, info.st_mtime_ns):
+            if entry['hash']!=hashFile(path):
+                toParse.append(i)
+                continue
+            entry.update(stats[i])
+        records[i]=pd.read_pickle(os.path.join(cacheDir, entry['file']))
+
+    #process whatever is new or changed and put it in the cache
+    parsed=parseFiles([fileNames[i] for i in toParse], pathName, polesInfo, workers, chunkSize)
+    for i, record in zip(toParse, parsed):
+        path=os.path.abspath(os.path.join(pathName, fileNames[i]))
+        digest=hashFile(path)
+        entryFile=digest+'-'+polesKey[0:12]+'.pkl'
+        pd.to_pickle(record, os.path.join(cacheDir, entryFile))
+        old=manifest.get(path)
+        manifest[path]=dict(stats[i], hash=digest, poles=polesKey, file=entryFile)
+        #clear out the old version of a changed file unless something else still uses it
+        if old is not None and old['file']!=entryFile and all(e['file']!=old['file'] for e in manifest.values()):
+            oldFile=os.path.join(cacheDir, old['file'])
+            if os.path.exists(oldFile):
+                os.remove(oldFile)
+        records[i]=record
+
+    #write the manifest to a temporary file first so a crash halfway through can't leave a broken one behind
+    with open(manifestPath+'.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifestPath+'.tmp', manifestPath)
+    return records
+
+
+#bump this whenever createRecords changes what it makes, so that old cached records aren't used
+cacheVersion=2
+
+"""
+hashFile
+-----------------------------------------------------------------
+makes a fingerprint (sha1 hash) of the contents of a file, reading it a block at a time.
+Two files with the same contents always get the same fingerprint.
+
+inputs:
+    path (string): the file to fingerprint
+outputs:
+    digest (string): the fingerprint as a string of hex characters
+"""
+
+def hashFile(path):
+    sha=hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1<<20), b''):
+            sha.update(block)
+    digest=sha.hexdigest()
+    return digest
+
+
+"""
+parseFiles
+-----------------------------------------------------------------
+runs createRecords on a list of files, one at a time or spread over several processes. This is
+the part of loadFiles that does the actual work, without the cache
+
+inputs:
+    fileNames (list of strings): names of the csv files
+    pathName (string): the path name of where the files are stored
+    polesInfo (dictionary): the pole registry from loadPoles, same as createRecords
+    workers (int): number of processes, same as loadFiles
+    chunkSize (int): rows read at a time, same as loadFiles
+    fileFunction (function): optional, what to run on each file instead of createRecords. It
+        gets the same arguments (see dailyStatsFile)
+outputs:
+    records (list): one result of createRecords (or fileFunction) per file, in the same 
+        order as fileNames
+"""
+
+def parseFiles(fileNames, pathName, polesInfo, workers=1, chunkSize=None, fileFunction=None):
+    if fileFunction is None:
+        fileFunction=createRecords
+    if workers is None:
+        workers=os.cpu_count()
+
+    #one at a time
+    if workers<=1 or len(fileNames)<2:
+        records=[fileFunction(f, pathName, polesInfo, chunkSize) for f in fileNames]
+        return records
+
+    #spread over several processes. map hands the results back in the order the files were 
+    #given, not the order they finish in. Files are sent out in small batches so the pole 
+    #information isn't copied over for every single one
+    batch=max(1, len(fileNames)//(4*workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        records=list(pool.map(fileFunction, fileNames, repeat(pathName), repeat(polesInfo), repeat(chunkSize), chunksize=batch))
+    return records
+
+
+"""
+stackFrames
+-----------------------------------------------------------------
+This function sticks a list of data frames (one per file, per sensor or per pole) together 
+in a single step. Building a frame up by calling append inside a loop copies everything 
+collected so far on every pass through the loop, so the time it takes grows with the square
+of the number of files. Collecting the pieces in a list and joining them once at the end 
+keeps it proportional to the amount of data instead. (append has also been removed from 
+newer versions of pandas, so this is how it has to be done now anyway.)
+
+inputs:
+    chunks (list of data frames): the pieces to join, in the order they should appear
+    columns (list of strings): the column names, used to make an empty frame if there are 
+        no pieces at all
+outputs:
+    frame (data frame): all of the pieces stacked on top of each other. The row labels of 
+        each piece are kept as they were, same as append did
+
+"""
+
+def stackFrames(chunks, columns):
+    if len(chunks)==0:
+        return pd.DataFrame(columns=columns)
+    frame=pd.concat(chunks)
+    return frame
+
+
+#names for daily averages data frame
+averageNames=['SerialNumber', 'Height', 'PoleNumber',  'DeployMonth','DeployDat','DeployYear','latitude', 
+ 'longitude', 'TrasectNumber', 'DataYear', 'DataMonth', 'DataDay', 'DaySince','Temperature','snowNoSnow', 'dailyVariance', 'Datayyyymmdd',
+ 'dailyMin', 'dailyMax', 'sampleCount', 'EpochDay']
+
+"""
+makeDailyAverages
+-----------------------------------------------------------------
+This function takes the hourly readings for all of the sensors and boils them down to 
+one row per sensor per calendar day, with the average temperature, the variance, the 
+coldest and warmest reading and the number of readings that day. It also codes each day 
+as snow (1) or no snow (0): a day counts as snow covered when the temperature barely moved 
+(variance above zero but below maxVariance) and the average sat near freezing (between 
+minTemp and maxTemp).
+
+Readings are grouped by the date they were taken on rather than by counting off 24 rows 
+at a time, so a missing hour only changes the day it's missing from instead of shifting 
+every day after it.
+
+inputs:
+    sensors (data frame): sensor information from stackRecords
+    measurements (data frame): every reading from stackRecords
+    maxVariance (float): largest daily variance that still counts as snow covered
+    minTemp (float): coldest daily average temperature (F) that still counts as snow covered
+    maxTemp (float): warmest daily average temperature (F) that still counts as snow covered
+outputs:
+    dailyAverages (data frame): one row per sensor per day with the columns in averageNames. 
+        The sensors are in the same order as the files were loaded in and the row labels count 
+        the days for each sensor from 0, the same as a frame built one sensor at a time
+
+"""
+
+def makeDailyAverages(sensors, measurements, maxVariance=1, minTemp=29.3, maxTemp=33):
+    #group every reading by sensor and day. The temperatures are worked on as 64 bit floats so
+    #adding up a lot of them doesn't lose precision
+    temps=measurements['Temperature'].astype(np.float64)
+    days=temps.groupby([measurements['sensorKey'].rename('sensorKey'), 
+                        (measurements['time']//minutesPerDay).rename('day')])
+
+    stats=pd.DataFrame({'count': days.count(), 
+                        'mean': days.mean(), 
+                        'variance': days.var(ddof=0), #same as np.var
+                        'min': days.min(), 
+                        'max': days.max()}).reset_index()
+    dailyAverages=finishDailyAverages(stats, sensors, maxVariance, minTemp, maxTemp)
+    return dailyAverages
+
+
+"""
+finishDailyAverages
+-----------------------------------------------------------------
+This function turns a table of statistics for each sensor and day into the dailyAverages 
+frame: it carries along the sensor's information, fills in the dates and codes snow or no 
+snow. It's the last step of makeDailyAverages.
+
+inputs:
+    stats (data frame): one row per sensor per day, sorted by sensor and then day, with the 
+        columns sensorKey, day (days since 1970), count, mean, variance, min and max
+    sensors (data frame): sensor information from stackRecords
+    maxVariance, minTemp, maxTemp (floats): snow coding limits, same as makeDailyAverages
+outputs:
+    dailyAverages (data frame): one row per sensor per day with the columns in averageNames. 
+        EpochDay is the date as the number of days since January 1st 1970, which is what every
+        later step uses. The year, month, day and yyyymmdd columns are the same date for reading
+"""
+
+def finishDailyAverages(stats, sensors, maxVariance, minTemp, maxTemp):
+    keys=stats['sensorKey'].to_numpy()
+
+    #copy most of the contents of the df to carry along the records (the pole information of the 
+    #sensor). These are copied over by position, same as the old loop did
+    dailyAverages=sensors.loc[keys].reset_index(drop=True)
+    dailyAverages.columns=averageNames[0:9]
+
+    #dates: the day number (days since 1970) that everything after this works with, the number of 
+    #calendar days since the sensor's first day, and the year, month, day and yyyymmdd for reading
+    day=stats['day'].to_numpy()
+    dailyAverages['EpochDay']=day
+    dailyAverages['DaySince']=day-stats.groupby('sensorKey')['day'].transform('min').to_numpy()
+    ymd=daysToYmd(day)
+    dailyAverages['DataYear']=ymd//10000
+    dailyAverages['DataMonth']=ymd//100%100
+    dailyAverages['DataDay']=ymd%100
+    dailyAverages['Datayyyymmdd']=ymd
+
+    dailyAverages['Temperature']=stats['mean'].to_numpy()
+    dailyAverages['dailyVariance']=stats['variance'].to_numpy()
+    dailyAverages['dailyMin']=loggerValues(stats['min'].to_numpy())
+    dailyAverages['dailyMax']=loggerValues(stats['max'].to_numpy())
+    dailyAverages['sampleCount']=stats['count'].to_numpy()
+
+    #coding for the snow versus no snow column
+    snow=codeSnow(dailyAverages['dailyVariance'], dailyAverages['Temperature'], maxVariance, minTemp, maxTemp)
+    dailyAverages['snowNoSnow']=snow.astype(float)
+
+    #number the days of each sensor from zero
+    dailyAverages.index=pd.Series(keys).groupby(keys).cumcount().to_numpy()
+    dailyAverages=dailyAverages[averageNames].astype(float)
+    return dailyAverages
+
+
+"""
+loggerValues
+-----------------------------------------------------------------
+readings are kept as 32 bit floats, which can't hold a number like 42.591 exactly, so turning
+one straight into a regular (64 bit) float gives 42.590999603271484. This turns them into
+the regular floats of the shortest numbers that are the same 32 bit float, which are the
+numbers the logger wrote (42.591)
+
+inputs:
+    values (array): readings that were stored as 32 bit floats
+outputs:
+    values (array of floats): the same readings as the logger wrote them
+"""
+
+def loggerValues(values):
+    values=np.asarray(values, dtype=np.float32).astype(str).astype(np.float64)
+    return values
+
+
+"""
+codeSnow
+-----------------------------------------------------------------
+the snow rule on its own: a day is snow covered when the variance is above zero but below 
+maxVariance and the average temperature is between minTemp and maxTemp. Everything follows 
+numpy's broadcasting rules, so the limits can be arrays too (see sweepThresholds)
+
+inputs:
+    variance (array or series): daily variance
+    aveTemp (array or series): daily average temperature (F)
+    maxVariance, minTemp, maxTemp (floats or arrays): snow coding limits
+outputs:
+    snow (array or series of bools): True where the day counts as snow covered
+"""
+
+def codeSnow(variance, aveTemp, maxVariance, minTemp, maxTemp):
+    snow=(variance<maxVariance) & (variance>0) & (aveTemp<=maxTemp) & (aveTemp>=minTemp)
+    return snow
+
+
+#names for the threshold sweep data frame
+sweepNames=['maxVariance', 'minTemp', 'maxTemp', 'PoleNumber', 'Height', 'coverageDays', 'firstYMD', 'lastYMD']
+
+"""
+sweepThresholds
+-----------------------------------------------------------------
+This function tries out several sets of snow coding limits (the options in Section Three) 
+on the daily statistics that are already in dailyAverages, so comparing them doesn't mean 
+editing the script and reading every file again. All of the sets are coded at once: the 
+limits are lined up as a column against the row of daily variances and temperatures, so 
+numpy makes the whole (sets x days) table of snow codes in one go. The snow days are then 
+boiled down with one grouped pass over every set, pole and sensor height.
+
+inputs:
+    dailyAverages (data frame): daily averages built by makeDailyAverages (or read back in 
+        from DailyAverages.csv with readTable). Only dailyVariance, Temperature, PoleNumber, 
+        Height and EpochDay are used
+    thresholds (list): sets of limits to try, each one (maxVariance, minTemp, maxTemp), e.g. 
+        [(1.5, 28.4, 35.6), (1, 29.3, 33), (1, 30, 33)]. thresholdGrid makes every 
+        combination of a few values of each
+outputs:
+    sweep (data frame): one row per set of limits per pole per sensor height with the 
+        columns in sweepNames: the limits, the number of days coded as snow (coverageDays) 
+        and the first and last of them. Sets are in the order they were given, then poles 
+        and heights in order. A sensor with no snow days under a set gets zeros. If a pole 
+        has two sensors at the same height, a day counts when either one is covered
+"""
+
+def sweepThresholds(dailyAverages, thresholds):
+    limits=np.array(thresholds, dtype=float).reshape(-1, 3)
+    variance=dailyAverages['dailyVariance'].to_numpy()
+    aveTemp=dailyAverages['Temperature'].to_numpy()
+
+    #(sets x days) snow codes, the limits as a column against every day as a row
+    snow=codeSnow(variance[None,:], aveTemp[None,:], limits[:,0,None], limits[:,1,None], limits[:,2,None])
+
+    #number the pole and height combinations, then key every snow day by set and combination
+    sensorKeys=dailyAverages[['PoleNumber','Height']]
+    groupCodes, groups=pd.MultiIndex.from_frame(sensorKeys).factorize(sort=True)
+    groups=pd.MultiIndex.from_tuples(groups, names=['PoleNumber','Height'])
+    sets, rows=np.nonzero(snow)
+    snowDays=pd.Series(dailyAverages['EpochDay'].to_numpy()[rows])
+    byKey=snowDays.groupby(sets*len(groups)+groupCodes[rows]).agg(['nunique','min','max'])
+    byKey=byKey.reindex(np.arange(len(limits)*len(groups)))
+
+    sweep=pd.DataFrame({'maxVariance': np.repeat(limits[:,0], len(groups)),
+                        'minTemp': np.repeat(limits[:,1], len(groups)),
+                        'maxTemp': np.repeat(limits[:,2], len(groups)),
+                        'PoleNumber': np.tile(groups.get_level_values('PoleNumber'), len(limits)),
+                        'Height': np.tile(groups.get_level_values('Height'), len(limits)),
+                        'coverageDays': byKey['nunique'].to_numpy(),
+                        'firstYMD': daysToYmd(byKey['min'].to_numpy()),
+                        'lastYMD': daysToYmd(byKey['max'].to_numpy())})
+    sweep=sweep[sweepNames].fillna(0).astype(float)
+    return sweep
+
+
+"""
+thresholdGrid
+-----------------------------------------------------------------
+every combination of a few values of each snow coding limit, for sweepThresholds. Sets where 
+minTemp is above maxTemp are left out
+
+inputs:
+    maxVariances (list of floats): values of maxVariance to try
+    minTemps (list of floats): values of minTemp to try
+    maxTemps (list of floats): values of maxTemp to try
+outputs:
+    thresholds (list): (maxVariance, minTemp, maxTemp) for every combination
+"""
+
+def thresholdGrid(maxVariances, minTemps, maxTemps):
+    thresholds=[(v, lo, hi) for v in maxVariances for lo in minTemps for hi in maxTemps if lo<=hi]
+    return thresholds
+
+
+"""
+fusedDailyAverages
+-----------------------------------------------------------------
+makeDailyAverages straight from the csv files, without ever holding all of the hourly 
+readings (or writing CombinedData). Each file is read a piece at a time (see recordChunks) 
+and every piece is boiled down to running totals for each day right away: the number of 
+readings, their average, the sum of squared differences from the average (M2, which is the 
+variance times the number of readings), and the coldest and warmest reading. The totals for 
+a day that's split across two pieces are combined with Welford's (Chan's) update, so the 
+averages and variances come out the same as makeDailyAverages gets from the full table, to 
+rounding. Only the daily totals for one file are ever held at a time, so memory depends on 
+the number of days, not the number of readings.
+
+Use this when only the daily products (DailyAverages, depths, summary) are needed. It doesn't 
+use the file cache, which holds the hourly readings.
+
+inputs:
+    fileList (list of strings): paths of the csv files exported from the hobo software
+    pathName (string): the path name of where the files are stored
+    polesInfo (dictionary): the pole registry from loadPoles
+    workers (int): number of processes, same as loadFiles
+    chunkSize (int): rows of each file read at a time
+    maxVariance, minTemp, maxTemp (floats): snow coding limits, same as makeDailyAverages
+outputs:
+    sensors (data frame): sensor information, the same as stackRecords makes
+    dailyAverages (data frame): the same as makeDailyAverages makes
+"""
+
+def fusedDailyAverages(fileList, pathName, polesInfo, workers=1, chunkSize=100000, 
+                       maxVariance=1, minTemp=29.3, maxTemp=33):
+    fileNames=[os.path.basename(f) for f in fileList]
+    results=parseFiles(fileNames, pathName, polesInfo, workers, chunkSize, dailyStatsFile)
+
+    sensors=pd.DataFrame([sensor for sensor, stats in results], columns=sensorNames, dtype=float)
+    sensors.index.name='sensorKey'
+    pieces=[stats.assign(sensorKey=key) for key, (sensor, stats) in enumerate(results)]
+    stats=stackFrames(pieces, ['day','count','mean','M2','min','max','sensorKey']).reset_index(drop=True)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats['variance']=np.where(stats['count']>0, stats['M2']/stats['count'], np.nan) #same as np.var
+    stats['mean']=stats['mean'].where(stats['count']>0)
+    dailyAverages=finishDailyAverages(stats, sensors, maxVariance, minTemp, maxTemp)
+    return sensors, dailyAverages
+
+
+"""
+dailyStatsFile
+-----------------------------------------------------------------
+the running daily totals for one file, a piece at a time. This is what each process runs in 
+fusedDailyAverages
+
+inputs:
+    filename (string): the name of an individaul csv file exported from the hobo software
+    pathName (string): the path name of where the files are stored
+    polesInfo (dictionary): the pole registry from loadPoles
+    chunkSize (int): rows read at a time
+outputs:
+    sensor (series): the sensor's information, same as createRecords
+    stats (data frame): one row per day in order, with the columns day (days since 1970), 
+        count, mean, M2, min and max
+"""
+
+def dailyStatsFile(filename, pathName, polesInfo, chunkSize=100000):
+    sensor=None
+    totals=None
+    for sensor, measurements in recordChunks(filename, pathName, polesInfo, chunkSize):
+        chunkTotals=dailyTotals(measurements)
+        totals=chunkTotals if totals is None else mergeDailyTotals(totals, chunkTotals)
+    stats=totals.reset_index()
+    return sensor, stats
+
+
+"""
+dailyTotals
+-----------------------------------------------------------------
+count, mean, M2 (sum of squared differences from the mean), min and max of the readings in 
+one piece of a file, for each day
+
+inputs:
+    measurements (data frame): from cleanReadings
+outputs:
+    totals (data frame): one row per day, labelled by day (days since 1970)
+"""
+
+def dailyTotals(measurements):
+    temps=measurements['Temperature'].astype(np.float64)
+    days=temps.groupby((measurements['time']//minutesPerDay).rename('day'))
+    count=days.count()
+    totals=pd.DataFrame({'count': count,
+                         'mean': days.mean().fillna(0),
+                         'M2': (days.var(ddof=0)*count).fillna(0),
+                         'min': days.min(),
+                         'max': days.max()})
+    return totals
+
+
+"""
+mergeDailyTotals
+-----------------------------------------------------------------
+combines the daily totals of two pieces of the same file (Chan et al.'s pairwise version of 
+Welford's update). Days that only show up in one of them are kept as they are
+
+inputs:
+    a, b (data frames): from dailyTotals (or an earlier mergeDailyTotals)
+outputs:
+    totals (data frame): the totals for both pieces together, one row per day in order
+"""
+
+def mergeDailyTotals(a, b):
+    days=a.index.union(b.index)
+    a=a.reindex(days)
+    b=b.reindex(days)
+    na=a['count'].fillna(0).to_numpy()
+    nb=b['count'].fillna(0).to_numpy()
+    ma=a['mean'].fillna(0).to_numpy()
+    mb=b['mean'].fillna(0).to_numpy()
+    n=na+nb
+    delta=mb-ma
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share=np.where(n>0, nb/n, 0)
+    totals=pd.DataFrame({'count': n.astype(np.int64),
+                         'mean': ma+delta*share,
+                         'M2': a['M2'].fillna(0).to_numpy()+b['M2'].fillna(0).to_numpy()+delta*delta*na*share,
+                         'min': np.fmin(a['min'].to_numpy(), b['min'].to_numpy()),
+                         'max': np.fmax(a['max'].to_numpy(), b['max'].to_numpy())}, index=days)
+    return totals
+
+
+#names for the data frame that describes snow depth on each date for each pole, followed by the yes (1) or
+#no (0) snow codes for each sensor depth
+snowCoverNames=['PoleNumber',  'DeployMonth','DeployDat','DeployYear','latitude', 
+ 'longitude', 'TrasectNumber', 'DataYear', 'DataMonth', 'DataDay', 'depth', 'YYYYMMDD', 'elevation']
+snowCodeNames=['025mYN','05N','1mYN','2mYN']
+
+"""
+codeDepths
+-----------------------------------------------------------------
+This function works out the snow depth at every pole on every date from the daily snow 
+codes of its four sensors. The codes are lined up by the actual date they were recorded on 
+(one row per pole and date, one column per sensor height), so sensors that started or 
+stopped on different days are still compared on the same day. A sensor with no reading on 
+a date counts as no snow.
+
+The depth is the highest sensor that is covered, as long as every sensor below it is 
+covered too: 0.25 m if the 0.25 m sensor is covered, 0.5 m if the 0.25 and 0.5 m sensors 
+are, 1 m if those and the 1 m sensor are, and 2 m if all four are. The snow code columns 
+follow the same rule (05N is only 1 when both the 0.25 and 0.5 m sensors are covered, and 
+so on).
+
+inputs:
+    dailyAverages (data frame): daily averages built by makeDailyAverages
+    poleList (list): the pole numbers to include, in the order they should appear
+    poleElevations (dictionary): pole number -> elevation of that pole
+outputs:
+    depths (data frame): one row per pole per date with the columns in snowCoverNames and
+        snowCodeNames, then EpochDay (the date as days since 1970, see finishDailyAverages). 
+        Poles are in the order of poleList and dates in order. The row labels count the 
+        dates of each pole from 0
+
+"""
+
+def codeDepths(dailyAverages, poleList, poleElevations):
+    daily=dailyAverages.loc[dailyAverages['PoleNumber'].isin(poleList)]
+
+    #snow codes as a table of (pole, date) rows by sensor height columns
+    #if a pole somehow has two sensors at the same height, either one being covered counts
+    codes=daily.groupby(['PoleNumber', 'EpochDay', 'Height'])['snowNoSnow'].max().unstack('Height')
+    codes=codes.reindex(columns=[0.25, 0.5, 1.0, 2.0]).fillna(0)==1
+
+    #each sensor only counts if every one below it is covered too
+    covered025=codes[0.25].to_numpy()
+    covered05=covered025 & codes[0.5].to_numpy()
+    covered1=covered05 & codes[1.0].to_numpy()
+    covered2=covered1 & codes[2.0].to_numpy()
+
+    depths=codes.index.to_frame(index=False)
+    depths['depth']=np.select([covered2, covered1, covered05, covered025], [2, 1, 0.5, 0.25], 0)
+    depths['YYYYMMDD']=daysToYmd(depths['EpochDay'].to_numpy())
+    depths['DataYear']=depths['YYYYMMDD']//10000
+    depths['DataMonth']=depths['YYYYMMDD']//100%100
+    depths['DataDay']=depths['YYYYMMDD']%100
+    depths['elevation']=depths['PoleNumber'].map(poleElevations)
+    for name, covered in zip(snowCodeNames, [covered025, covered05, covered1, covered2]):
+        depths[name]=covered.astype(float)
+
+    #all the sort of header stuff (deployment, lat, long, transect) comes from the pole's first daily row
+    poleInfo=daily.groupby('PoleNumber')[snowCoverNames[1:7]].first()
+    depths=depths.join(poleInfo, on='PoleNumber')
+
+    #put the poles in the order of poleList (the grouping above sorted them by number)
+    poleOrder=depths['PoleNumber'].map({float(p):i for i,p in enumerate(poleList)})
+    depths=depths.iloc[np.argsort(poleOrder.to_numpy(), kind='stable')]
+    depths.index=depths.groupby('PoleNumber', sort=False).cumcount()
+    depths=depths[snowCoverNames+snowCodeNames+['EpochDay']].astype(float)
+    return depths
+
+
+#names for the summary data frame
+summaryNames=['PoleNumber',  'DeployMonth','DeployDat','DeployYear','latitude', 
+ 'longitude', 'TrasectNumber', 'firstYMD025','lastYMD025','duration025', 
+                                 'firstYMD05','lastYMD05','duration05'
+                                 , 'firstYMD1','lastYMD1','duration1', 
+                                 'firstYMDshield','lastYMDshield','durationshield', 'Elevation']
+
+"""
+summarizeWinter
+-----------------------------------------------------------------
+This function makes the little summary table of when the snow appeared at each depth at each
+pole during one winter: the first date with snow, the last date with snow and the number of 
+days between them, for each of the four sensor depths. It does nothing to address any thawing 
+and refreezing in between (snowPeriods and coverageTotals do).
+
+Everything is done in one grouped pass over depths: the dates without snow at a depth are 
+blanked out, and the first and last snow dates are the earliest and latest dates left for 
+each pole.
+
+inputs:
+    depths (data frame): snow depths built by codeDepths
+    poleList (list): the pole numbers to summarize, in the order they should appear
+    winterStart (float): first date of the winter in the yyyymmdd format, e.g. 20201001
+    winterEnd (float): last date of the winter in the yyyymmdd format
+outputs:
+    summary (data frame): one row per pole with the columns in summaryNames. If a pole never
+        froze over at a depth (or the data is missing), the dates and duration for that depth 
+        are zeros
+
+"""
+
+def summarizeWinter(depths, poleList, winterStart, winterEnd):
+    inWinter=(depths['EpochDay']>=ymdToDays(winterStart)) & (depths['EpochDay']<=ymdToDays(winterEnd))
+    winter=depths.loc[inWinter & depths['PoleNumber'].isin(poleList)]
+    summary=summarizeGroups(winter, poleList)
+    return summary
+
+
+"""
+summarizeSeasons
+-----------------------------------------------------------------
+summarizeWinter for every winter in depths at once. Each date belongs to the snow season that 
+started on the last seasonStart (month and day) on or before it, so with the default of 
+August 1st, everything from August 1st 2020 to July 31st 2021 is the 2020 season. All of the 
+poles and seasons are summarized together in one grouped pass, so a whole archive of winters 
+doesn't mean running everything once per winter.
+
+inputs:
+    depths (data frame): snow depths built by codeDepths
+    poleList (list): the pole numbers to summarize, in the order they should appear
+    seasonStart (int): month and day each season starts on as mmdd, e.g. 801 for August 1st. 
+        Pick a day in the summer when there's no snow anywhere
+outputs:
+    summary (data frame): one row per pole per season (poles in the order of poleList, seasons 
+        in order within each pole) with the columns in summaryNames followed by Season, the 
+        year the season started in. Every pole gets a row for every season in depths, with 
+        zeros if it has no snow (or no data) that season
+"""
+
+def summarizeSeasons(depths, poleList, seasonStart=801):
+    rows=depths.loc[depths['PoleNumber'].isin(poleList)]
+    season=snowSeason(rows['EpochDay'], seasonStart)
+    summary=summarizeGroups(rows, poleList, season)
+    return summary
+
+
+"""
+snowSeason
+-----------------------------------------------------------------
+the snow season each date falls in: the year of the last seasonStart on or before the date
+
+inputs:
+    days (series): dates as days since 1970
+    seasonStart (int): month and day each season starts on as mmdd
+outputs:
+    season (series): the year each date's season started in
+"""
+
+def snowSeason(days, seasonStart=801):
+    ymd=daysToYmd(days.to_numpy()).astype(np.int64)
+    season=pd.Series(ymd//10000-(ymd%10000<seasonStart), index=days.index, name='Season')
+    return season
+
+
+"""
+summarizeGroups
+-----------------------------------------------------------------
+the grouped pass behind summarizeWinter and summarizeSeasons: the dates without snow at a depth 
+are blanked out, and the first and last snow dates are the earliest and latest dates left for 
+each pole (and season, if there are seasons)
+
+inputs:
+    rows (data frame): the rows of depths to summarize
+    poleList (list): the pole numbers to summarize, in order
+    season (series): optional, the season of each row. None summarizes each pole over all of 
+        the rows
+outputs:
+    summary (data frame): one row per pole (or pole and season) with the columns in 
+        summaryNames, plus Season if there are seasons
+"""
+
+def summarizeGroups(rows, poleList, season=None):
+    poles=[float(p) for p in poleList]
+    if season is None:
+        keys=[rows['PoleNumber']]
+        groups=pd.Index(poles, name='PoleNumber')
+    else:
+        keys=[rows['PoleNumber'], season]
+        groups=pd.MultiIndex.from_product([poles, sorted(season.unique())], names=['PoleNumber','Season'])
+
+    #the day number of every row, blanked out wherever that depth had no snow
+    snowDates=pd.DataFrame({code: rows['EpochDay'].where(rows[code]==1) for code in snowCodeNames})
+    byGroup=snowDates.groupby(keys)
+    first=byGroup.min()
+    last=byGroup.max()
+
+    #pole biographical information and elevation from the group's first row
+    info=rows.groupby(keys)[snowCoverNames[0:7]+['elevation']].first()
+
+    summary=pd.DataFrame(index=groups)
+    summary[summaryNames[0:7]]=info[snowCoverNames[0:7]]
+    for code, depthName in zip(snowCodeNames, ['025','05','1','shield']):
+        summary['firstYMD'+depthName]=daysToYmd(first[code].reindex(groups).to_numpy())
+        summary['lastYMD'+depthName]=daysToYmd(last[code].reindex(groups).to_numpy())
+        summary['duration'+depthName]=last[code]-first[code]
+    summary['Elevation']=info['elevation']
+    summary['PoleNumber']=summary.index.get_level_values('PoleNumber')
+
+    columns=summaryNames
+    if season is not None:
+        summary['Season']=summary.index.get_level_values('Season')
+        columns=summaryNames+['Season']
+    summary=summary.reset_index(drop=True)[columns].fillna(0).astype(float)
+    return summary
+
+
+#names for the snow periods data frame and the coverage totals made from it
+periodNames=['PoleNumber', 'Height', 'Season', 'period', 'startYMD', 'endYMD', 'length', 'gapBefore']
+coverageNames=['PoleNumber', 'Height', 'Season', 'periods', 'coveredDays', 'thawDays', 'firstYMD', 'lastYMD', 'span']
+
+#sensor height that goes with each of the snow code columns of depths
+codeHeights=[0.25, 0.5, 1.0, 2.0]
+
+"""
+snowPeriods
+-----------------------------------------------------------------
+This function breaks the snow record of every pole into its continuous stretches of snow 
+cover, so thaws in the middle of a winter show up instead of being hidden between the first 
+and last snow date. It works off the snow codes in depths, so a height counts as covered on 
+a day when the snow is at least that deep (that sensor and every one below it are covered).
+
+Everything is done at once for every pole, height and season: the covered days are lined up 
+in order and a new period starts wherever the pole, height or season changes or the day isn't 
+the one right after the last. A day with no data at all (no row in depths) ends a period, 
+the same as a day without snow.
+
+inputs:
+    depths (data frame): snow depths built by codeDepths
+    poleList (list): the pole numbers to include, in the order they should appear
+    seasonStart (int): month and day each season starts on as mmdd (see summarizeSeasons)
+outputs:
+    periods (data frame): one row per period with the columns in periodNames: the pole, the 
+        height, the season, the period's number within that pole, height and season (from 1), 
+        its first and last day in the yyyymmdd format, its length in days and the days 
+        without snow since the period before it (0 for the first one). Poles are in the order 
+        of poleList, then heights, seasons and periods in order
+"""
+
+def snowPeriods(depths, poleList, seasonStart=801):
+    rows=depths.loc[depths['PoleNumber'].isin(poleList)]
+    day=rows['EpochDay'].to_numpy().astype(np.int64)
+    season=snowSeason(rows['EpochDay'], seasonStart).to_numpy()
+    poleOrder=rows['PoleNumber'].map({float(p):i for i,p in enumerate(poleList)}).to_numpy()
+
+    #one long list of every covered (pole, height, day), stacking the four snow code columns
+    covered=[rows[code].to_numpy()==1 for code in snowCodeNames]
+    pole=np.concatenate([poleOrder[c] for c in covered])
+    height=np.concatenate([np.full(c.sum(), i) for i, c in enumerate(covered)])
+    season=np.concatenate([season[c] for c in covered])
+    day=np.concatenate([day[c] for c in covered])
+    order=np.lexsort((day, season, height, pole))
+    pole, height, season, day=pole[order], height[order], season[order], day[order]
+
+    #a period starts wherever the pole, height or season changes or a day is skipped
+    sameSeries=np.zeros(len(day), dtype=bool)
+    sameSeries[1:]=(pole[1:]==pole[:-1]) & (height[1:]==height[:-1]) & (season[1:]==season[:-1])
+    starts=~sameSeries
+    starts[1:]|=day[1:]!=day[:-1]+1
+    ends=np.zeros(len(day), dtype=bool)
+    ends[:-1]=starts[1:]
+    ends[-1:]=True
+    first=np.flatnonzero(starts)
+    last=np.flatnonzero(ends)
+
+    #thaw before each period: days since the end of the one before it, if it's in the same series
+    gapBefore=np.zeros(len(first))
+    continues=sameSeries[first]
+    gapBefore[continues]=day[first[continues]]-day[first[continues]-1]-1
+
+    periods=pd.DataFrame({'PoleNumber': np.asarray(poleList, dtype=float)[pole[first]],
+                          'Height': np.asarray(codeHeights)[height[first]],
+                          'Season': season[first],
+                          'startYMD': daysToYmd(day[first]),
+                          'endYMD': daysToYmd(day[last]),
+                          'length': last-first+1,
+                          'gapBefore': gapBefore})
+    periods['period']=periods.groupby(['PoleNumber','Height','Season']).cumcount()+1
+    periods=periods[periodNames].astype(float)
+    return periods
+
+
+"""
+coverageTotals
+-----------------------------------------------------------------
+adds up the snow periods for each pole, height and season: how many separate periods of snow 
+cover there were, the days actually covered, the days of thaw between the first and last 
+period, and the first and last snow date with the number of days between them (span, the 
+same as the duration columns of the summary, which count the thaws as covered)
+
+inputs:
+    periods (data frame): from snowPeriods
+outputs:
+    totals (data frame): one row per pole, height and season that had any snow, with the 
+        columns in coverageNames, in the same order as periods
+"""
+
+def coverageTotals(periods):
+    byGroup=periods.groupby(['PoleNumber','Height','Season'], sort=False)
+    totals=byGroup.agg(periods=('period','size'), coveredDays=('length','sum'), thawDays=('gapBefore','sum'),
+                       firstYMD=('startYMD','min'), lastYMD=('endYMD','max')).reset_index()
+    totals['span']=ymdToDays(totals['lastYMD'])-ymdToDays(totals['firstYMD'])
+    totals=totals[coverageNames].astype(float)
+    return totals
+
+
+"""
+ymdToDays
+-----------------------------------------------------------------
+turns dates in the yyyymmdd format (so that December 4, 2020 would be 20201204) into day 
+numbers (days since January 1st 1970), all at once with numpy's calendar arithmetic instead 
+of one date at a time. With day numbers, the days between two dates is just a subtraction and 
+a range of dates is just two comparisons. Blank and zero dates (the summary's "no snow") come 
+out blank (nan)
+
+inputs:
+    ymd (float, array or series): dates in the yyyymmdd format
+outputs:
+    days (float or array of floats): the same dates as days since 1970
+"""
+
+def ymdToDays(ymd):
+    ymd=np.asarray(ymd, dtype=float)
+    valid=ymd>0
+    ymd=np.where(valid, ymd, 19700101).astype(np.int64)
+    months=(ymd//10000-1970)*12+ymd//100%100-1
+    days=months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)+ymd%100-1
+    days=np.where(valid, days, np.nan)
+    return days
+
+
+"""
+daysToYmd
+-----------------------------------------------------------------
+the other way around from ymdToDays: day numbers (days since 1970) to dates in the yyyymmdd 
+format, all at once. Blank days stay blank (nan)
+
+inputs:
+    days (array): days since 1970
+outputs:
+    ymd (array of floats): the same dates in the yyyymmdd format
+"""
+
+def daysToYmd(days):
+    days=np.asarray(days, dtype=float)
+    valid=~np.isnan(days)
+    dates=np.where(valid, days, 0).astype(np.int64).astype('datetime64[D]')
+    months=dates.astype('datetime64[M]')
+    year=months.astype('datetime64[Y]').astype(np.int64)+1970
+    month=months.astype(np.int64)%12+1
+    day=(dates-months.astype('datetime64[D]')).astype(np.int64)+1
+    ymd=np.where(valid, year*10000+month*100+day, np.nan)
+    return ymd
+
+
+"""
+buildIndex
+-----------------------------------------------------------------
+This function makes a lookup table from the values in one or more columns of a data frame
+(a serial number, a pole number, a pole and height pair...) to the rows that have them. 
+Building it takes a single pass over the frame. After that, pulling out the rows for one 
+sensor or pole is a dictionary lookup and a slice, instead of comparing every row of the 
+frame against the number you're after every time. Use it with lookupRows below.
+
+inputs:
+    frame (data frame): the frame to index, e.g. largeFrame, dailyAverages or depths
+    columns (string or list of strings): the column(s) to look rows up by. With a list, the 
+        keys of the lookup table are tuples of values in the same order, e.g. (pole, height)
+outputs:
+    index (dictionary): value -> rows with that value. When the rows for a value are all next 
+        to each other (as they are for each sensor or pole) it's a slice, otherwise it's an 
+        array of row positions
+
+"""
+
+def buildIndex(frame, columns):
+    positions=frame.groupby(columns, sort=False).indices
+    index={}
+    for key, rows in positions.items():
+        if rows[-1]-rows[0]+1==len(rows): #one unbroken block of rows
+            index[key]=slice(rows[0], rows[-1]+1)
+        else:
+            index[key]=rows
+    return index
+
+
+"""
+lookupRows
+-----------------------------------------------------------------
+This function pulls the rows for one value out of a frame using a table made by buildIndex.
+
+inputs:
+    frame (data frame): the same frame that was given to buildIndex
+    index (dictionary): the lookup table from buildIndex
+    key (float or tuple): the value you want the rows for (e.g. a pole number, or a 
+        (pole, height) pair if the index was built on two columns)
+outputs:
+    rows (data frame): the rows with that value, with their original row labels. Empty if 
+        there aren't any
+
+"""
+
+def lookupRows(frame, index, key):
+    rows=frame.iloc[index.get(key, slice(0,0))]
+    return rows
+
+
+#the type every column is stored as in parquet and feather files. Anything not listed stays a float
+columnTypes={'SerialNumber':'int64', 'PoleNumber':'int16', 'TrasectNumber':'int16',
+             'DeployYear':'int16', 'DeployMonth':'int16', 'DeployDat':'int16',
+             'DataYear':'int16', 'DataMonth':'int8', 'DataDay':'int8', 'DataHour':'int8',
+             'DaySince':'int32', 'snowNoSnow':'int8', 'sampleCount':'int32',
+             'Datayyyymmdd':'int32', 'YYYYMMDD':'int32', 'EpochDay':'int32',
+             '025mYN':'int8', '05N':'int8', '1mYN':'int8', '2mYN':'int8',
+             'firstYMD025':'int32', 'lastYMD025':'int32', 'duration025':'int32',
+             'firstYMD05':'int32', 'lastYMD05':'int32', 'duration05':'int32',
+             'firstYMD1':'int32', 'lastYMD1':'int32', 'duration1':'int32',
+             'firstYMDshield':'int32', 'lastYMDshield':'int32', 'durationshield':'int32'}
+
+#file endings for each of the output formats
+tableFormats={'csv':'.csv', 'parquet':'.parquet', 'feather':'.feather'}
+
+"""
+writeTable
+-----------------------------------------------------------------
+This function saves one of the main tables (CombinedData, DailyAverages, depths, summary) 
+as a csv file or as a compressed columnar file (parquet or feather). The csv is the same as
+it always was. Parquet and feather files store each column as its real type (the whole 
+number columns in columnTypes become integers instead of floats), which makes them much 
+smaller and much faster for other programs to read back than a csv. They need the pyarrow 
+package.
+
+The table can also be handed over in pieces (any list or generator of data frames with the
+same columns), in which case each piece is written as soon as it arrives and the whole 
+table never has to be in memory at once.
+
+inputs:
+    frame (data frame, or list/generator of data frames): the table to save
+    pathStem (string): where to save it, without the file ending (e.g. inPath+'depths')
+    fileFormat (string): 'csv' (the default), 'parquet' or 'feather'
+outputs:
+    filePath (string): the full name of the file that was saved
+
+"""
+
+def writeTable(frame, pathStem, fileFormat='csv'):
+    if fileFormat not in tableFormats:
+        raise ValueError("fileFormat must be one of %s, not %r" %(list(tableFormats), fileFormat))
+    filePath=pathStem+tableFormats[fileFormat]
+    chunks=[frame] if isinstance(frame, pd.DataFrame) else frame
+
+    if fileFormat=='csv':
+        with open(filePath, 'w', newline='') as f:
+            first=True
+            for chunk in chunks:
+                chunk.to_csv(f, header=first)
+                first=False
+        return filePath
+
+    if importlib.util.find_spec('pyarrow') is None:
+        raise ImportError("Saving %s files needs the pyarrow package (pip install pyarrow, or conda install pyarrow). "
+                          "Set the output format to 'csv' to do without it." %fileFormat)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer=None
+    for chunk in chunks:
+        #columnar files don't keep the row numbers, and get the proper column types. Whole number
+        #columns use the pandas types that allow blanks, so every piece comes out with the same types
+        typed=chunk.reset_index(drop=True)
+        for column in typed.columns:
+            if column in columnTypes:
+                typed[column]=typed[column].astype(columnTypes[column].capitalize())
+        table=pa.Table.from_pandas(typed, preserve_index=False)
+        if writer is None:
+            if fileFormat=='parquet':
+                writer=pq.ParquetWriter(filePath, table.schema, compression='zstd')
+            else:
+                writer=pa.ipc.new_file(filePath, table.schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+    return filePath
+
+
+"""
+readTable
+-----------------------------------------------------------------
+opens a table saved by writeTable (or by any earlier version of this code), going by the 
+file ending to decide how
+
+inputs:
+    filePath (string): the .csv, .parquet or .feather file to open
+outputs:
+    frame (data frame): the table
+"""
+
+def readTable(filePath):
+    ending=os.path.splitext(filePath)[1].lower()
+    if ending=='.parquet':
+        frame=pd.read_parquet(filePath)
+    elif ending=='.feather':
+        frame=pd.read_feather(filePath)
+    else:
+        frame=pd.read_csv(filePath, index_col=0)
+    return frame
+
+
 """
 polePlotter
 -----------------------------------------------------------------
@@ -128,6 +1479,9 @@ inputs:
     dailyAverages (data frame): a pandas dataframe of daily averages that has been 
     built by the makeArray function
     pathName (string): where you want the files to be saved
+    poleIndex (dictionary): optional, a buildIndex table of dailyAverages by PoleNumber.
+        When plotting a lot of poles, building that once and passing it in saves searching
+        the whole frame for every pole
 outputs:
     this funtion does not return any values but saves two files to the desired path:
     -CSV file: has all the logger information (administrative and data) for the 
@@ -139,77 +1493,19 @@ outputs:
 
 
 
-def polePlotter(poleNumber, dailyAverages, pathName):
+def polePlotter(poleNumber, dailyAverages, pathName, poleIndex=None):
+    #the drawing itself is in plots.py. It's imported here rather than at the top of this file so
+    #processing the data without any plots (see pipeline.py) never has to load matplotlib
+    from plots import renderPole
     inPath=pathName
-    #pull data from DF, separate into individual logger information
-    #based on depth
-    pole=dailyAverages.loc[dailyAverages['PoleNumber']==float(poleNumber)]
-    a=pole.loc[[1],['DeployMonth', 'DeployDat', 'DeployYear']].to_numpy()
-    m=a[0][0]
-    d=a[0][1]
-    y=a[0][2]
-    a,b,c=pole.loc[[0],['DeployMonth', 'DeployDat', 'DeployYear']]
-    meter025=pole.loc[pole['Height']==float(0.25)]
-    meter05=pole.loc[pole['Height']==float(0.5)]
-    meter1=pole.loc[pole['Height']==float(1)]
-    meter2=pole.loc[pole['Height']==float(2)]
-    
-    #convert into NP arrays
-    meter025=meter025.to_numpy()
-    meter05=meter05.to_numpy()
-    meter1=meter1.to_numpy()
-    meter2=meter2.to_numpy()
-    
-    #make plots of temperature as a function of time
-    plt.figure(poleNumber)
-   # plt.plot(meter025[:,12], meter025[:,13],label='0.25 meters') #blue
-   # plt.plot(meter05[:,12], meter05[:,13],label='0.5 meters') #orange
-   # plt.plot(meter1[:,12], meter1[:,13],label='1 meter')#green
-   # plt.plot(meter2[:,12], meter2[:,13],label='shield')#red
-    
-   
-    cmap=plt.get_cmap("Oranges")
-    colors=cmap([0.25,0.5,0.75,1])
-    
-    
-    #cropping outthe first couple of data points for each pole because we turned on the loggers
-    #while they were in the office and were recording room temp not outdoor air temp. YMMV
-    plt.plot(meter2[10:,12], meter2[10:,13],label='Shield', color=colors[0])#red
-    plt.plot(meter1[10:,12], meter1[10:,13],label='1 m', color=colors[1])#green
-    plt.plot(meter05[10:,12], meter05[10:,13],label='0.5 m', color=colors[2]) #orange
-    plt.plot(meter025[10:,12], meter025[10:,13],label='0.25 m', color=colors[3]) #blue
-    #plt.xlabel("Days Since %d/%d/%d" %(m, d, y))
-    plt.xlabel('Date')
-    plt.ylabel("Temperature (F)")
-    plt.xticks([0,100,200,300],['October 2020','January 2021','April 2021','August 2021'])
-    #plt.title("Pole: %d" %poleNumber)
-    plt.title("Daily Temperature at Pole %d" %poleNumber)
-    plt.legend(title='Sensor Depth')
-   # plt.legend()
-    #save plot
-    plt.savefig(inPath+'temperatureProfile'+str(poleNumber)+'.png')
-    
-  
-    
-    
-    #make plots of snow/no snow as a function of time--we found this to not be super helpful but you're more than 
-    #welcome to uncomment it if desired.
-    """
-    plt.figure(poleNumber+20)
-    plt.plot(meter025[:,12], meter025[:,13], label='0.25 meter temp')
-    plt.plot(meter025[:,12], meter025[:,14]*30, linestyle='', marker='1', label='0.25 meter code')
-    plt.plot(meter05[:,12], meter05[:,14]*30, linestyle='', marker='1', label='0.5 meter code')
-    plt.plot(meter1[:,12], meter1[:,14]*30, linestyle='', marker='1', label='1 meter code')
-    plt.plot(meter2[:,12], meter2[:,14]*30, linestyle='', marker='1', label='shield code')
-    plt.xlabel("Days Since %d / %d / %d" %(d, m, y))
-    plt.ylabel("Snow Level")
-    plt.title("Pole: %d" %poleNumber)
-    plt.legend()
-    """
-    
-    
-    #make csv file for catted pole
-    pole.to_csv(inPath+'pole'+str(poleNumber)+'.csv')
+    #pull data from DF for this pole
+    if poleIndex is None:
+        pole=dailyAverages.loc[dailyAverages['PoleNumber']==float(poleNumber)]
+    else:
+        pole=lookupRows(dailyAverages, poleIndex, float(poleNumber))
+
+    #save the temperature profile png and the csv file for the pole
+    renderPole(poleNumber, pole, None, inPath)
     
 
 
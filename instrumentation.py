@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Keeps track of how long each step of a run takes, how many rows it got through and how much
+memory it needed, and saves all of that to a JSON file at the end (the run report). When a
+run takes an hour, this is how to tell which step is responsible.
+
+Use it by wrapping each step in measureStage:
+
+    report=startReport()
+    with measureStage(report, 'ingest') as stage:
+        ...do the work...
+        stage['rows']=number of rows it handled
+    finishReport(report, 'RunReport.json')
+
+Every stage gets its wall time in seconds, the rows (if given) and rows per second, and the
+most memory the whole program has used so far (maxRssMB, the operating system's count, which
+is free to look up but only ever goes up, and isn't available on Windows). For the memory a
+single stage needed, traceMemory=True measures the peak memory python had in use during each
+stage (peakMB) with tracemalloc. That counts numpy and pandas data too, but it makes code that
+makes lots of small python objects (writing csv files especially) several times slower, so
+it's off unless asked for. Work done in other processes (workers more than 1) only shows up
+in the time, not in the memory or the profile.
+
+profile=True also runs every stage under cProfile. The full profile is saved next to the
+report (open it with python -m pstats or snakeviz) and the functions that took the most time
+(including the time spent in whatever they call) are listed in the report itself.
+"""
+import cProfile
+import json
+import os
+import platform
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError: #windows
+    resource=None
+
+
+#how many of the slowest functions to list in the report when profiling
+profileTop=25
+
+
+"""
+startReport
+-----------------------------------------------------------------
+starts a run report
+
+inputs:
+    traceMemory (bool): measure the peak memory of each stage with tracemalloc
+    profile (bool): run every stage under cProfile
+outputs:
+    report (dictionary): pass this to measureStage and finishReport
+"""
+
+def startReport(traceMemory=False, profile=False):
+    report={'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'stages': [], '_start': time.perf_counter(), '_profiler': None, '_tracing': False}
+    if traceMemory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        report['_tracing']=True
+    if profile:
+        report['_profiler']=cProfile.Profile()
+    return report
+
+
+"""
+measureStage
+-----------------------------------------------------------------
+times whatever runs inside a with block as one stage of the report. The stage's entry (a
+dictionary) is what the with statement hands back, so the rows it went through can be filled
+in with stage['rows']=... before the block ends. Anything else put in it ends up in the
+report too. A stage that fails is still recorded, with the error.
+
+inputs:
+    report (dictionary): from startReport. None measures nothing, so the same code can run
+        with or without a report
+    name (string): what to call the stage
+    rows (int): optional, the number of rows the stage handles if it's known up front
+    quiet (bool): don't print the stage's line when it finishes
+outputs:
+    stage (dictionary): the stage's entry in the report
+"""
+
+@contextmanager
+def measureStage(report, name, rows=None, quiet=False):
+    stage={'stage': name, 'rows': rows}
+    if report is None:
+        yield stage
+        return
+
+    tracing=tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    profiler=report['_profiler']
+    if profiler is not None:
+        profiler.enable()
+    start=time.perf_counter()
+    try:
+        yield stage
+    except BaseException as error:
+        stage['error']=repr(error)
+        raise
+    finally:
+        stage['seconds']=time.perf_counter()-start
+        if profiler is not None:
+            profiler.disable()
+        if tracing:
+            current, peak=tracemalloc.get_traced_memory()
+            stage['peakMB']=peak/1e6
+            stage['endMB']=current/1e6
+        if resource is not None:
+            stage['maxRssMB']=maxRssMB()
+        if stage['rows'] is not None and stage['seconds']>0:
+            stage['rowsPerSecond']=stage['rows']/stage['seconds']
+        report['stages'].append(stage)
+        if not quiet:
+            print(describeStage(stage))
+
+
+"""
+describeStage
+-----------------------------------------------------------------
+one line of text about a finished stage, e.g. "ingest: 12.3 s, 500000 rows (40650 rows/s),
+peak 210 MB"
+"""
+
+def describeStage(stage):
+    text='%s: %.2f s' %(stage['stage'], stage['seconds'])
+    if stage['rows'] is not None:
+        text+=', %d rows' %stage['rows']
+        if 'rowsPerSecond' in stage:
+            text+=' (%.0f rows/s)' %stage['rowsPerSecond']
+    if 'peakMB' in stage:
+        text+=', peak %.0f MB' %stage['peakMB']
+    elif 'maxRssMB' in stage:
+        text+=', %.0f MB used so far' %stage['maxRssMB']
+    return text
+
+
+"""
+maxRssMB
+-----------------------------------------------------------------
+the most memory (MB) this program has had at any one time so far, according to the operating
+system. Linux counts it in kB and macs in bytes
+"""
+
+def maxRssMB():
+    peak=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system()=='Darwin':
+        return peak/1e6
+    return peak/1e3
+
+
+"""
+finishReport
+-----------------------------------------------------------------
+wraps up a run report: adds the total time, stops the memory tracing and profiler (if this
+report started them) and saves the report as JSON
+
+inputs:
+    report (dictionary): from startReport
+    filePath (string): optional, where to save the report. When profiling, the profile goes
+        next to it with the same name but ending in .prof. None doesn't save anything
+outputs:
+    report (dictionary): the finished report, only the parts that go in the JSON file
+"""
+
+def finishReport(report, filePath=None):
+    finished={key: value for key, value in report.items() if not key.startswith('_')}
+    finished['totalSeconds']=time.perf_counter()-report['_start']
+    if report['_tracing']:
+        finished['peakMB']=max([s['peakMB'] for s in report['stages'] if 'peakMB' in s], default=0)
+        tracemalloc.stop()
+    if resource is not None:
+        finished['maxRssMB']=maxRssMB()
+
+    profiler=report['_profiler']
+    if profiler is not None and len(report['stages']):
+        stats=pstats.Stats(profiler)
+        slowest=sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[0:profileTop]
+        finished['profile']=[{'function': '%s:%d(%s)' %where, 'calls': counts[1], 
+                              'ownSeconds': counts[2], 'cumulativeSeconds': counts[3]}
+                             for where, counts in slowest]
+        if filePath is not None:
+            stats.dump_stats(os.path.splitext(filePath)[0]+'.prof')
+
+    if filePath is not None:
+        with open(filePath, 'w') as f:
+            json.dump(finished, f, indent=1)
+    return finished
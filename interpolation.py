@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Snow depth (or the chance of snow cover) everywhere in the basin, not just at the poles: the
+pole measurements are spread over a regular latitude/longitude grid with inverse distance
+weighting (IDW), for every day of a season at once.
+
+How it works:
+    1. the grid and the pole positions go into a KD tree (scipy's cKDTree), which finds the
+       nearest few poles to every grid point. Each grid point gets a weight for each of
+       those poles of 1/distance**power, and none for the others. This only depends on where
+       things are, so it's done once.
+    2. the weights are a (grid points x poles) matrix and the measurements are a (poles x
+       days) matrix, so one matrix product gives every grid point on every day. Poles without
+       data on a day are left out of that day by running the same product on a matrix of
+       which poles have data and dividing by it.
+    3. optionally, elevation: if the elevation of every grid point is known (from a DEM
+       resampled onto the grid), a straight line of depth against elevation is fitted across
+       the poles for each day (all days at once, from a handful of matrix products), only
+       what's left over after the line is spread with IDW, and the line is added back using
+       each grid point's own elevation. That way a grid point high up the valley gets more
+       snow than its low lying neighbor poles would give it. Poles.csv only has elevations at
+       the poles, so without a DEM this step is skipped.
+
+    snowCube=buildCube(dailyAverages, depths, poleList)
+    dates, gridLat, gridLon, maps=basinMaps(snowCube, 20201001, 20210630)
+    maps[i]                             #depth on dates[i], shape (len(gridLat), len(gridLon))
+
+Use it from the same directory as functions.py.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+from functions import ymdToDays
+
+
+#km per degree of latitude, and of longitude at the equator
+kmPerDegree=111.2
+
+
+"""
+gridAround
+-----------------------------------------------------------------
+a regular latitude/longitude grid over the poles, with a bit of room around the edges
+
+inputs:
+    latitude, longitude (arrays): pole positions
+    cells (int): number of grid points along each side
+    margin (float): room to leave around the poles, as a fraction of the area they cover
+outputs:
+    gridLat (array): latitude of each grid row
+    gridLon (array): longitude of each grid column
+"""
+
+def gridAround(latitude, longitude, cells=100, margin=0.1):
+    axes=[]
+    for values in [latitude, longitude]:
+        low, high=np.nanmin(values), np.nanmax(values)
+        room=(high-low)*margin
+        axes.append(np.linspace(low-room, high+room, cells))
+    gridLat, gridLon=axes
+    return gridLat, gridLon
+
+
+"""
+toKilometers
+-----------------------------------------------------------------
+turns latitudes and longitudes into kilometers east and north of a reference latitude, which
+is close enough to flat over a basin that straight line distances can be used
+
+inputs:
+    latitude, longitude (arrays): positions
+    referenceLat (float): latitude the longitudes are scaled at
+outputs:
+    points (array): one (east, north) row per position, in km
+"""
+
+def toKilometers(latitude, longitude, referenceLat):
+    east=np.asarray(longitude, dtype=float)*kmPerDegree*np.cos(np.radians(referenceLat))
+    north=np.asarray(latitude, dtype=float)*kmPerDegree
+    points=np.column_stack([east, north])
+    return points
+
+
+"""
+idwWeights
+-----------------------------------------------------------------
+the inverse distance weights from every pole to every grid point, found with a KD tree so only
+the nearest few poles to each grid point are looked at. A grid point right on a pole just
+gets that pole
+
+inputs:
+    poleLat, poleLon (arrays): pole positions
+    gridLat, gridLon (arrays): the grid rows and columns (from gridAround)
+    neighbors (int): number of nearest poles that count for each grid point
+    power (float): how fast a pole's weight falls off with distance
+outputs:
+    weights (array): shape (grid points, poles), grid points going across each row of the grid
+        and then down. The weights of each grid point aren't scaled to add up to one, since
+        that's done day by day with the poles that have data (see interpolateDays)
+"""
+
+def idwWeights(poleLat, poleLon, gridLat, gridLon, neighbors=8, power=2):
+    referenceLat=np.nanmean(poleLat)
+    poles=toKilometers(poleLat, poleLon, referenceLat)
+    lonMesh, latMesh=np.meshgrid(gridLon, gridLat)
+    grid=toKilometers(latMesh.ravel(), lonMesh.ravel(), referenceLat)
+
+    #poles without a position get no weight anywhere
+    placed=np.flatnonzero(~np.isnan(poles).any(axis=1))
+    neighbors=min(neighbors, len(placed))
+    distance, nearest=cKDTree(poles[placed]).query(grid, k=neighbors)
+    distance, nearest=distance.reshape(len(grid), neighbors), nearest.reshape(len(grid), neighbors)
+    with np.errstate(divide='ignore'):
+        near=1/distance**power
+    #a grid point sitting on a pole takes that pole's value
+    onPole=np.isinf(near)
+    near[onPole.any(axis=1)]=onPole[onPole.any(axis=1)]
+
+    weights=np.zeros((len(grid), len(poles)))
+    np.put_along_axis(weights, placed[nearest], near, axis=1)
+    return weights
+
+
+"""
+elevationTrend
+-----------------------------------------------------------------
+a straight line of the values against elevation across the poles, fitted separately for every
+day but all at once: the sums the least squares fit needs are matrix products over the poles
+with data. Poles without an elevation are left out. A day with fewer than two poles, or poles
+that are all at the same elevation, gets a flat line at its average
+
+inputs:
+    values (array): shape (poles, days), nan where a pole has no data
+    elevation (array): elevation of each pole, nan where it isn't known
+outputs:
+    intercept, slope (arrays): the line for each day
+"""
+
+def elevationTrend(values, elevation):
+    #poles without an elevation can't go on the line, so they count as having no data
+    placed=~np.isnan(elevation)
+    present=(~np.isnan(values) & placed[:,None]).astype(float)
+    filled=np.where(present>0, values, 0)
+    elevation=np.where(placed, elevation, 0)
+    n=present.sum(axis=0)
+    sumE=elevation@present
+    sumEE=(elevation**2)@present
+    sumV=filled.sum(axis=0)
+    sumEV=elevation@filled
+    spread=n*sumEE-sumE**2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope=np.where((n>=2) & (spread>1e-9*np.maximum(n*sumEE, 1)), (n*sumEV-sumE*sumV)/spread, 0)
+        intercept=np.where(n>0, (sumV-slope*sumE)/n, np.nan)
+    return intercept, slope
+
+
+"""
+interpolateDays
+-----------------------------------------------------------------
+spreads the pole values over the grid for every day at once (steps 2 and 3 at the top of
+this file)
+
+inputs:
+    values (array): shape (poles, days), nan where a pole has no data
+    weights (array): from idwWeights
+    poleElevation (array): optional, elevation of each pole. Needed along with gridElevation.
+        Poles without an elevation are left out when it's used
+    gridElevation (array): optional, elevation of every grid point, in the same order as the
+        rows of weights (or shape (rows, columns) of the grid). None skips the elevation line
+outputs:
+    estimates (array): shape (grid points, days). nan where none of a grid point's poles had
+        data that day
+"""
+
+def interpolateDays(values, weights, poleElevation=None, gridElevation=None):
+    values=np.asarray(values, dtype=float)
+    useElevation=gridElevation is not None and poleElevation is not None
+    if useElevation:
+        poleElevation=np.asarray(poleElevation, dtype=float)
+        intercept, slope=elevationTrend(values, poleElevation)
+        values=values-(intercept+np.outer(poleElevation, slope))
+
+    present=(~np.isnan(values)).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        estimates=(weights@np.nan_to_num(values))/(weights@present)
+    if useElevation:
+        estimates+=intercept+np.outer(np.ravel(gridElevation), slope)
+    return estimates
+
+
+"""
+basinMaps
+-----------------------------------------------------------------
+snow depth (or the chance of snow cover at a height) over the whole basin on every day from
+start to end, from the poles in a SnowCube (see cube.py). The pole positions and elevations
+are the ones in Poles.csv
+
+inputs:
+    snowCube (SnowCube): from buildCube, with depths
+    start, end (ints): optional, first and last date in the yyyymmdd format. None uses every
+        day in the cube, and so do dates before its first day or after its last, so the maps 
+        only cover the days that there's data for (check dates for the days you got)
+    height (float): optional. None maps the snow depth (m). A height maps the chance that the
+        snow is at least that deep instead, between 0 and 1
+    cells (int): number of grid points along each side
+    neighbors (int): number of nearest poles that count for each grid point
+    power (float): how fast a pole's weight falls off with distance
+    gridElevation (array): optional, shape (cells, cells), elevation of every grid point in the
+        same units as Poles.csv, e.g. from a DEM. None leaves out the elevation line
+outputs:
+    dates (array of datetime64): the date of each map
+    gridLat (array): latitude of each grid row
+    gridLon (array): longitude of each grid column
+    maps (array): shape (days, cells, cells). Depths below zero or chances outside of 0 to 1
+        that the elevation line can give are clipped
+"""
+
+def basinMaps(snowCube, start=None, end=None, height=None, cells=100, neighbors=8, power=2, gridElevation=None):
+    #dates outside of the cube are moved in to its first or last day
+    lastDay=len(snowCube.days)-1
+    first=0 if start is None else int(np.clip(ymdToDays(start)-snowCube.firstDay, 0, lastDay))
+    last=lastDay if end is None else int(np.clip(ymdToDays(end)-snowCube.firstDay, 0, lastDay))
+    values=snowCube.depth[:, first:last+1]
+    if height is not None:
+        values=np.where(np.isnan(values), np.nan, values>=height)
+
+    gridLat, gridLon=gridAround(snowCube.latitude, snowCube.longitude, cells)
+    weights=idwWeights(snowCube.latitude, snowCube.longitude, gridLat, gridLon, neighbors, power)
+    estimates=interpolateDays(values, weights, snowCube.elevation, gridElevation)
+
+    maps=estimates.T.reshape(-1, len(gridLat), len(gridLon))
+    maps=np.clip(maps, 0, None if height is None else 1)
+    dates=snowCube.dates[first:last+1]
+    return dates, gridLat, gridLon, maps
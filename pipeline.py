@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+The processing steps of PoleProcessing.py as functions you can import, plus a command line
+version that runs them all without anyone sitting at the computer (for example as a scheduled
+job every time new exports get copied over).
+
+PoleProcessing.py is still the place to go through the data step by step and make the
+plots by hand. This file does the same processing (it uses the same functions from
+functions.py) but everything it needs comes in as arguments instead of CHANGE ME lines, and
+matplotlib is only imported if plots are actually being made, so a run with --no-plots
+starts quickly and never tries to open a window.
+
+Stages, in the order they run:
+    ingest:  read every HOBO export in a folder and match them to Poles.csv
+    daily:   daily averages and the snow/no snow code for each sensor
+    depths:  snow depth at each pole on each date
+    summary: first and last snow date at each depth during the winter
+    seasons: the same summary for every snow season in the data
+    periods: every separate stretch of snow cover, and the days covered and thawed each season
+    plots:   temperature and snow coverage profile pngs for each pole (see plots.py)
+
+From the command line (run it from the same directory as functions.py):
+    python pipeline.py CSVFiles --poles Poles.csv --winter 20201001 20210630
+    python pipeline.py CSVFiles --poles Poles.csv --winter 20201001 20210630 --no-plots --workers 4
+    python pipeline.py CSVFiles --poles Poles.csv --daily-only --season-start 901
+python pipeline.py --help lists everything else.
+
+Every output file is named the same way as in PoleProcessing.py: the output prefix (the data
+folder, unless --out says otherwise) followed by CombinedData, DailyAverages, depths, summary,
+seasonSummary, snowPeriods, coverageTotals or temperatureProfile<pole>, snowCoverageProfile<pole> and pole<pole>. Each run also saves a
+run report (RunReport.json, see instrumentation.py) with the time, rows per second and
+memory use of every stage, and --profile adds the slowest functions to it.
+"""
+import argparse
+import glob
+import os
+from instrumentation import startReport, measureStage, finishReport
+from archive import appendToArchive
+from functions import (loadPoles, elevationsByPole, loadFiles, stackRecords, writeCombinedData,
+                       makeDailyAverages, fusedDailyAverages, codeDepths, summarizeWinter, summarizeSeasons,
+                       snowPeriods, coverageTotals, writeTable, tableFormats)
+
+
+"""
+runIngest
+-----------------------------------------------------------------
+reads the pole information file and every csv file in the data folder and puts them together
+(Section Two of PoleProcessing.py). If an output prefix is given, CombinedData gets written too.
+
+inputs:
+    dataDir (string): folder with the csv files exported from the hobo software
+    poleFile (string): path of the pole information csv file (Poles.csv)
+    workers (int): number of processes used to read the files, see loadFiles
+    cacheDir (string): folder for the processed file cache, None to not use one
+    outPrefix (string): optional, start of the output file names. None doesn't write anything
+    outputFormat (string): 'csv', 'parquet' or 'feather', see writeTable
+    chunkSize (int): optional, rows of each file read at a time, see createRecords
+outputs:
+    registry (dictionary): the pole information from loadPoles
+    sensors (data frame), measurements (data frame): the combined data from stackRecords
+"""
+
+def runIngest(dataDir, poleFile, workers=1, cacheDir=None, outPrefix=None, outputFormat='csv', chunkSize=None):
+    registry=loadPoles(poleFile)
+    fileList=glob.glob(os.path.join(dataDir, '*.csv'))
+    records=loadFiles(fileList, dataDir, registry, workers, cacheDir, chunkSize)
+    sensors, measurements=stackRecords(records)
+    if outPrefix is not None:
+        writeCombinedData(sensors, measurements, outPrefix+'CombinedData', outputFormat)
+    return registry, sensors, measurements
+
+
+"""
+runDaily
+-----------------------------------------------------------------
+daily averages and snow coding for every sensor (Section Three of PoleProcessing.py). The
+defaults are the recommended snow limits from there.
+
+inputs:
+    sensors (data frame), measurements (data frame): from runIngest
+    maxVariance, minTemp, maxTemp (floats): snow limits, see makeDailyAverages
+    outPrefix (string): optional, start of the output file names. None doesn't write anything
+    outputFormat (string): 'csv', 'parquet' or 'feather'
+outputs:
+    dailyAverages (data frame): from makeDailyAverages
+"""
+
+def runDaily(sensors, measurements, maxVariance=1, minTemp=29.3, maxTemp=33, outPrefix=None, outputFormat='csv'):
+    dailyAverages=makeDailyAverages(sensors, measurements, maxVariance, minTemp, maxTemp)
+    if outPrefix is not None:
+        writeTable(dailyAverages, outPrefix+'DailyAverages', outputFormat)
+    return dailyAverages
+
+
+"""
+runFusedDaily
+-----------------------------------------------------------------
+runIngest and runDaily in one pass over the files, for when only the daily products are 
+needed (see fusedDailyAverages). The hourly readings are never all held at once and 
+CombinedData isn't written.
+
+inputs:
+    dataDir (string): folder with the csv files exported from the hobo software
+    poleFile (string): path of the pole information csv file (Poles.csv)
+    workers (int): number of processes used to read the files
+    chunkSize (int): rows of each file read at a time
+    outPrefix (string): optional, start of the output file names. None doesn't write anything
+    outputFormat (string): 'csv', 'parquet' or 'feather'
+outputs:
+    registry (dictionary): the pole information from loadPoles
+    sensors (data frame): sensor information, same as runIngest
+    dailyAverages (data frame): same as runDaily
+"""
+
+def runFusedDaily(dataDir, poleFile, workers=1, chunkSize=100000, outPrefix=None, outputFormat='csv'):
+    registry=loadPoles(poleFile)
+    fileList=glob.glob(os.path.join(dataDir, '*.csv'))
+    sensors, dailyAverages=fusedDailyAverages(fileList, dataDir, registry, workers, chunkSize)
+    if outPrefix is not None:
+        writeTable(dailyAverages, outPrefix+'DailyAverages', outputFormat)
+    return registry, sensors, dailyAverages
+
+
+"""
+runDepths
+-----------------------------------------------------------------
+snow depth at each pole on each date (Section Four of PoleProcessing.py), with the pole
+elevations taken from the pole information file
+
+inputs:
+    dailyAverages (data frame): from runDaily
+    registry (dictionary): from runIngest
+    poleList (list): pole numbers to include, in order
+    outPrefix (string): optional, start of the output file names. None doesn't write anything
+    outputFormat (string): 'csv', 'parquet' or 'feather'
+outputs:
+    depths (data frame): from codeDepths
+"""
+
+def runDepths(dailyAverages, registry, poleList, outPrefix=None, outputFormat='csv'):
+    poleDepths=codeDepths(dailyAverages, poleList, elevationsByPole(registry))
+    if outPrefix is not None:
+        writeTable(poleDepths, outPrefix+'depths', outputFormat)
+    return poleDepths
+
+
+"""
+runSummary
+-----------------------------------------------------------------
+first and last date with snow at each depth at each pole during the winter (Section Five of
+PoleProcessing.py)
+
+inputs:
+    poleDepths (data frame): from runDepths
+    poleList (list): pole numbers to include, in order
+    winterStart, winterEnd (ints): first and last date of the winter in the yyyymmdd format
+    outPrefix (string): optional, start of the output file names. None doesn't write anything
+    outputFormat (string): 'csv', 'parquet' or 'feather'
+outputs:
+    summary (data frame): from summarizeWinter
+"""
+
+def runSummary(poleDepths, poleList, winterStart, winterEnd, outPrefix=None, outputFormat='csv'):
+    winterSummary=summarizeWinter(poleDepths, poleList, winterStart, winterEnd)
+    if outPrefix is not None:
+        writeTable(winterSummary, outPrefix+'summary', outputFormat)
+    return winterSummary
+
+
+"""
+runSeasons
+-----------------------------------------------------------------
+the same summary for every winter in the data at once, one row per pole per season (see 
+summarizeSeasons)
+
+inputs:
+    poleDepths (data frame): from runDepths
+    poleList (list): pole numbers to include, in order
+    seasonStart (int): month and day each season starts on as mmdd, e.g. 801 for August 1st
+    outPrefix (string): optional, start of the output file names. None doesn't write anything
+    outputFormat (string): 'csv', 'parquet' or 'feather'
+outputs:
+    seasonSummary (data frame): from summarizeSeasons
+"""
+
+def runSeasons(poleDepths, poleList, seasonStart=801, outPrefix=None, outputFormat='csv'):
+    seasonSummary=summarizeSeasons(poleDepths, poleList, seasonStart)
+    if outPrefix is not None:
+        writeTable(seasonSummary, outPrefix+'seasonSummary', outputFormat)
+    return seasonSummary
+
+
+"""
+runPeriods
+-----------------------------------------------------------------
+every separate stretch of snow cover at each pole, height and season, and how many days were 
+actually covered and thawed (see snowPeriods and coverageTotals)
+
+inputs:
+    poleDepths (data frame): from runDepths
+    poleList (list): pole numbers to include, in order
+    seasonStart (int): month and day each season starts on as mmdd
+    outPrefix (string): optional, start of the output file names. None doesn't write anything
+    outputFormat (string): 'csv', 'parquet' or 'feather'
+outputs:
+    periods (data frame): from snowPeriods
+    coverage (data frame): from coverageTotals
+"""
+
+def runPeriods(poleDepths, poleList, seasonStart=801, outPrefix=None, outputFormat='csv'):
+    periods=snowPeriods(poleDepths, poleList, seasonStart)
+    coverage=coverageTotals(periods)
+    if outPrefix is not None:
+        writeTable(periods, outPrefix+'snowPeriods', outputFormat)
+        writeTable(coverage, outPrefix+'coverageTotals', outputFormat)
+    return periods, coverage
+
+
+"""
+runPlots
+-----------------------------------------------------------------
+saves the temperature and snow coverage profile pngs and the poleXXXX.csv file for each pole
+(see renderPolePlots in plots.py). This is the only stage that needs matplotlib, and plots.py
+is imported here rather than at the top of the file so the other stages never load it.
+
+inputs:
+    dailyAverages (data frame): from runDaily
+    poleDepths (data frame): from runDepths
+    poleList (list): pole numbers to plot
+    outPrefix (string): start of the file names
+    workers (int): number of processes drawing at once
+outputs:
+    filePaths (list of strings): every file that was saved
+"""
+
+def runPlots(dailyAverages, poleDepths, poleList, outPrefix, workers=1):
+    from plots import renderPolePlots
+    filePaths=renderPolePlots(dailyAverages, poleDepths, poleList, outPrefix, workers)
+    return filePaths
+
+
+"""
+runPipeline
+-----------------------------------------------------------------
+runs every stage in order and writes all of the outputs
+
+inputs:
+    dataDir (string): folder with the csv files exported from the hobo software
+    poleFile (string): path of the pole information csv file
+    winterStart, winterEnd (ints): first and last date of the winter in the yyyymmdd format. 
+        None for both skips the single winter summary
+    poleList (list): optional, pole numbers to include. None uses every pole in poleFile
+    workers (int): number of processes used to read the files and draw the plots
+    cacheDir (string): folder for the processed file cache, None to not use one
+    outPrefix (string): optional, start of the output file names. None uses dataDir, the same
+        as PoleProcessing.py (without a slash on the end, so the outputs go next to the folder
+        of exports rather than into it)
+    outputFormat (string): 'csv', 'parquet' or 'feather'
+    makePlots (bool): whether to save the per-pole pngs and csv files
+    chunkSize (int): optional, rows of each file read at a time. None reads whole files
+    dailyOnly (bool): use runFusedDaily instead of runIngest and runDaily, so CombinedData 
+        isn't made (and the cache isn't used)
+    report (dictionary): optional, a run report from startReport (see instrumentation.py). 
+        Each stage, and each file written, is measured in it
+    seasonStart (int): month and day (mmdd) each snow season starts on, for the summary of 
+        every season
+    archiveDir (string): optional, folder of the hourly archive to add the readings to (see 
+        archive.py). None doesn't keep one. Not used with dailyOnly, which never has all of 
+        the hourly readings
+outputs:
+    results (dictionary): the tables from each stage, with the keys registry, sensors,
+        measurements (None with dailyOnly), dailyAverages, depths, summary (None without a 
+        winter), seasonSummary, periods and coverage
+"""
+
+def runPipeline(dataDir, poleFile, winterStart, winterEnd, poleList=None, workers=1, cacheDir=None,
+                outPrefix=None, outputFormat='csv', makePlots=True, chunkSize=None, dailyOnly=False, report=None,
+                seasonStart=801, archiveDir=None):
+    if outPrefix is None:
+        outPrefix=dataDir.rstrip('/'+os.sep)
+    if dailyOnly:
+        measurements=None
+        with measureStage(report, 'fusedDaily') as stage:
+            registry, sensors, dailyAverages=runFusedDaily(dataDir, poleFile, workers, chunkSize or 100000)
+            stage['rows']=int(dailyAverages['sampleCount'].sum())
+    else:
+        with measureStage(report, 'ingest') as stage:
+            registry, sensors, measurements=runIngest(dataDir, poleFile, workers, cacheDir, chunkSize=chunkSize)
+            stage['rows']=len(measurements)
+        if archiveDir is not None:
+            with measureStage(report, 'archive', len(measurements)):
+                appendToArchive(archiveDir, sensors, measurements)
+        with measureStage(report, 'writeCombinedData', len(measurements)):
+            writeCombinedData(sensors, measurements, outPrefix+'CombinedData', outputFormat)
+        with measureStage(report, 'daily', len(measurements)):
+            dailyAverages=runDaily(sensors, measurements)
+    writeStage(report, dailyAverages, outPrefix, 'DailyAverages', outputFormat)
+    if poleList is None:
+        poleList=sorted(elevationsByPole(registry))
+
+    with measureStage(report, 'depths', len(dailyAverages)):
+        poleDepths=runDepths(dailyAverages, registry, poleList)
+    writeStage(report, poleDepths, outPrefix, 'depths', outputFormat)
+    winterSummary=None
+    if winterStart is not None:
+        with measureStage(report, 'summary', len(poleDepths)):
+            winterSummary=runSummary(poleDepths, poleList, winterStart, winterEnd)
+        writeStage(report, winterSummary, outPrefix, 'summary', outputFormat)
+    with measureStage(report, 'seasons', len(poleDepths)):
+        seasonSummary=runSeasons(poleDepths, poleList, seasonStart)
+    writeStage(report, seasonSummary, outPrefix, 'seasonSummary', outputFormat)
+    with measureStage(report, 'periods', len(poleDepths)):
+        periods, coverage=runPeriods(poleDepths, poleList, seasonStart)
+    writeStage(report, periods, outPrefix, 'snowPeriods', outputFormat)
+    writeStage(report, coverage, outPrefix, 'coverageTotals', outputFormat)
+    if makePlots:
+        with measureStage(report, 'plots'):
+            runPlots(dailyAverages, poleDepths, poleList, outPrefix, workers)
+
+    results={'registry': registry, 'sensors': sensors, 'measurements': measurements,
+             'dailyAverages': dailyAverages, 'depths': poleDepths, 'summary': winterSummary,
+             'seasonSummary': seasonSummary, 'periods': periods, 'coverage': coverage}
+    return results
+
+
+"""
+writeStage
+-----------------------------------------------------------------
+writeTable, measured as its own stage of the run report (named write followed by the table's
+name)
+
+inputs:
+    report (dictionary): from startReport, or None
+    frame (data frame): the table to save
+    outPrefix (string): start of the file name
+    name (string): the table's name, which goes on the end of outPrefix
+    outputFormat (string): 'csv', 'parquet' or 'feather'
+outputs:
+    filePath (string): where it was saved
+"""
+
+def writeStage(report, frame, outPrefix, name, outputFormat):
+    with measureStage(report, 'write'+name, len(frame)):
+        filePath=writeTable(frame, outPrefix+name, outputFormat)
+    return filePath
+
+
+"""
+main
+-----------------------------------------------------------------
+the command line version of runPipeline. See the top of this file or python pipeline.py --help
+
+inputs:
+    argv (list of strings): optional, the command line arguments. None uses the real ones
+outputs:
+    none
+"""
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description="Process HOBO snow pole exports into daily averages, "
+                                   "snow depths and winter summaries.")
+    parser.add_argument('dataDir', help="folder with the csv files exported from the hobo software")
+    parser.add_argument('--poles', default='Poles.csv', help="pole information csv file (default Poles.csv)")
+    parser.add_argument('--winter', nargs=2, type=int, default=(None, None), metavar=('START','END'),
+                        help="first and last date of a winter to summarize on its own as yyyymmdd, e.g. 20201001 20210630")
+    parser.add_argument('--season-start', type=int, default=801, 
+                        help="month and day every snow season starts on as mmdd for seasonSummary (default 801, August 1st)")
+    parser.add_argument('--pole-list', type=lambda s: [int(p) for p in s.split(',')], default=None,
+                        help="comma separated pole numbers to include, e.g. 1,3,4 (default every pole)")
+    parser.add_argument('--workers', type=int, default=1, help="processes used to read the files and draw the plots (default 1)")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help="read each export this many rows at a time to keep memory down on very big files")
+    parser.add_argument('--daily-only', action='store_true',
+                        help="go straight to the daily averages without making CombinedData (uses much less memory)")
+    parser.add_argument('--cache-dir', default=None, help="processed file cache folder (default dataDir+'Cache')")
+    parser.add_argument('--no-cache', action='store_true', help="don't use the processed file cache")
+    parser.add_argument('--archive', default=None, 
+                        help="folder of the hourly archive to add the readings to (default none, see archive.py)")
+    parser.add_argument('--out', default=None, help="start of the output file names (default dataDir)")
+    parser.add_argument('--format', choices=list(tableFormats), default='csv', help="output table format")
+    parser.add_argument('--no-plots', action='store_true', help="don't make any plots (matplotlib isn't imported)")
+    parser.add_argument('--report', default=None, 
+                        help="where to save the JSON run report (default output prefix+'RunReport.json')")
+    parser.add_argument('--trace-memory', action='store_true', 
+                        help="measure the peak memory of each stage with tracemalloc (slows csv writing down a lot)")
+    parser.add_argument('--profile', action='store_true', 
+                        help="run every stage under cProfile and list the slowest functions in the report")
+    args=parser.parse_args(argv)
+    #the outputs go next to the folder of exports, not into it, even if it was given with a slash on the end
+    dataPrefix=args.dataDir.rstrip('/'+os.sep)
+    outPrefix=args.out if args.out is not None else dataPrefix
+
+    cacheDir=None
+    if not args.no_cache:
+        cacheDir=args.cache_dir if args.cache_dir is not None else dataPrefix+'Cache'
+
+    report=startReport(args.trace_memory, args.profile)
+    results=runPipeline(args.dataDir, args.poles, args.winter[0], args.winter[1], args.pole_list,
+                        args.workers, cacheDir, outPrefix, args.format, not args.no_plots, args.chunk_size,
+                        args.daily_only, report, args.season_start, args.archive)
+    reportFile=args.report if args.report is not None else outPrefix+'RunReport.json'
+    finished=finishReport(report, reportFile)
+    print("Processed %d sensors, %d readings and %d pole seasons in %.1f s. The run report is in %s"
+          %(len(results['sensors']), results['dailyAverages']['sampleCount'].sum(), len(results['seasonSummary']),
+            finished['totalSeconds'], reportFile))
+
+
+if __name__ == '__main__':
+    main()
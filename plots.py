@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Saving the per-pole figures (temperature profiles and snow coverage profiles) as pngs.
+
+Everything in here draws on its own matplotlib Figure with the Agg (png) renderer instead of
+going through pyplot, so no window ever opens, figure numbers from different sections can't
+land on top of each other and each figure is thrown away as soon as it's saved instead of
+staying open until the script ends. Since the poles don't depend on each other, they can also
+be drawn on several cores at once with renderPolePlots.
+
+Use it from the same directory as functions.py.
+"""
+import os
+import numpy as np
+import matplotlib
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from functions import buildIndex, lookupRows
+
+
+#the four shades of orange used for the sensors, lightest (shield) to darkest (0.25 m)
+colors=matplotlib.colormaps['Oranges']([0.25,0.5,0.75,1])
+
+#sensor heights and their legend labels, in the order they're drawn
+sensorHeights=[(2,'Shield'), (1,'1 m'), (0.5,'0.5 m'), (0.25,'0.25 m')]
+
+
+"""
+newFigure
+-----------------------------------------------------------------
+makes a figure and its axes that aren't registered with pyplot, so nothing has to close them:
+they're gone as soon as nothing refers to them any more
+
+inputs:
+    none
+outputs:
+    fig (Figure): the figure, with an Agg canvas attached
+    ax (Axes): the single set of axes on it
+"""
+
+def newFigure():
+    fig=Figure()
+    FigureCanvasAgg(fig)
+    ax=fig.add_subplot()
+    return fig, ax
+
+
+"""
+dateAxis
+-----------------------------------------------------------------
+turns day numbers (days since 1970, the EpochDay column) into dates matplotlib can put on an 
+axis, and labels the x axis of ax with month names that fit whatever dates are on it
+
+inputs:
+    ax (Axes): the axes to label
+    days (array): days since 1970
+outputs:
+    dates (array of datetime64): the same days as dates
+"""
+
+def dateAxis(ax, days):
+    locator=mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    dates=days.astype(np.int64).astype('datetime64[D]')
+    return dates
+
+
+"""
+temperatureProfile
+-----------------------------------------------------------------
+saves the daily temperature of every sensor on one pole as a png (the same plot polePlotter
+has always made). The x axis is the actual date, so the month labels fit any year of data
+
+inputs:
+    poleNumber (float): the pole being plotted
+    pole (data frame): the rows of dailyAverages for that pole
+    pathName (string): start of the file name, the pole number and .png get added on
+outputs:
+    filePath (string): where the png was saved
+"""
+
+def temperatureProfile(poleNumber, pole, pathName):
+    fig, ax=newFigure()
+    #the axis is labelled once, for all of the sensors
+    dates=dateAxis(ax, pole['EpochDay'].to_numpy())
+    temperatures=pole['Temperature'].to_numpy()
+    for (height, label), color in zip(sensorHeights, colors):
+        sensor=(pole['Height']==float(height)).to_numpy()
+        #cropping outthe first couple of data points for each pole because we turned on the loggers
+        #while they were in the office and were recording room temp not outdoor air temp. YMMV
+        ax.plot(dates[sensor][10:], temperatures[sensor][10:], label=label, color=color)
+    ax.set_xlabel('Date')
+    ax.set_ylabel("Temperature (F)")
+    ax.set_title("Daily Temperature at Pole %d" %poleNumber)
+    ax.legend(title='Sensor Depth')
+
+    filePath=pathName+'temperatureProfile'+str(poleNumber)+'.png'
+    fig.savefig(filePath)
+    return filePath
+
+
+"""
+coverageProfile
+-----------------------------------------------------------------
+saves the snow coverage at one pole as a function of time as a png. Depths over 1.5 m (the
+2 m sensor) are drawn at 1.4 m so they don't squash the rest of the plot
+
+inputs:
+    poleNumber (float): the pole being plotted
+    poleDepths (data frame): the rows of depths for that pole
+    pathName (string): start of the file name, the pole number and .png get added on
+outputs:
+    filePath (string): where the png was saved
+"""
+
+def coverageProfile(poleNumber, poleDepths, pathName):
+    depth=poleDepths['depth'].to_numpy(copy=True)
+    depth[depth>1.5]=1.4
+
+    fig, ax=newFigure()
+    ax.plot(dateAxis(ax, poleDepths['EpochDay'].to_numpy()), depth, linestyle='', marker='1', color=colors[2])
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Sensor Coverage (meters)")
+    ax.set_title("Snow Coverage as a function of time for Pole %d" %poleNumber)
+
+    filePath=pathName+'snowCoverageProfile'+str(poleNumber)+'.png'
+    fig.savefig(filePath)
+    return filePath
+
+
+"""
+renderPole
+-----------------------------------------------------------------
+everything saved for a single pole: its temperature profile, its coverage profile (if there
+are depths) and its slice of dailyAverages as poleXXXX.csv. This is what each process runs in
+renderPolePlots
+
+inputs:
+    poleNumber (float): the pole
+    pole (data frame): the rows of dailyAverages for that pole
+    poleDepths (data frame): the rows of depths for that pole, or None to skip the coverage plot
+    pathName (string): start of the file names
+outputs:
+    filePaths (list of strings): the files that were saved
+"""
+
+def renderPole(poleNumber, pole, poleDepths, pathName):
+    filePaths=[temperatureProfile(poleNumber, pole, pathName)]
+    if poleDepths is not None and len(poleDepths):
+        filePaths.append(coverageProfile(poleNumber, poleDepths, pathName))
+    pole.to_csv(pathName+'pole'+str(poleNumber)+'.csv')
+    filePaths.append(pathName+'pole'+str(poleNumber)+'.csv')
+    return filePaths
+
+
+"""
+renderPolePlots
+-----------------------------------------------------------------
+saves the temperature profile, coverage profile and poleXXXX.csv for every pole in a list,
+one pole at a time or spread over several processes. Each process is only sent the rows for
+the poles it's drawing, and every figure is thrown away once it's saved, so memory stays
+about the same however many poles there are. Like loadFiles, more than one worker needs the
+if __name__ == '__main__': protection on Windows and Macs.
+
+inputs:
+    dailyAverages (data frame): daily averages built by makeDailyAverages
+    depths (data frame): depths built by codeDepths, or None to skip the coverage plots
+    poleList (list): the poles to draw
+    pathName (string): start of the file names
+    workers (int): number of processes. 1 (the default) draws them one at a time, None uses
+        every core on the computer
+outputs:
+    filePaths (list of strings): every file that was saved, pole by pole in poleList order
+"""
+
+def renderPolePlots(dailyAverages, depths, poleList, pathName, workers=1):
+    poleIndex=buildIndex(dailyAverages, 'PoleNumber')
+    poles=[lookupRows(dailyAverages, poleIndex, float(p)) for p in poleList]
+    if depths is None:
+        poleDepths=[None]*len(poleList)
+    else:
+        depthIndex=buildIndex(depths, 'PoleNumber')
+        poleDepths=[lookupRows(depths, depthIndex, float(p)) for p in poleList]
+
+    if workers is None:
+        workers=os.cpu_count()
+    if workers<=1 or len(poleList)<2:
+        saved=[renderPole(p, pole, d, pathName) for p, pole, d in zip(poleList, poles, poleDepths)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            saved=list(pool.map(renderPole, poleList, poles, poleDepths, repeat(pathName)))
+    filePaths=[f for files in saved for f in files]
+    return filePaths
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Makes up snow pole data: HOBO style csv exports for every sensor plus a matching Poles.csv, so
+the processing (and how long it takes, see benchmarks.py) can be tried out without any real
+field data. Nothing in here is needed to process your own data.
+
+The exports look like the ones the HOBO software writes: a "Serial Number" line and a "Plot
+Title" line, then the column names and one row per reading with the date as
+yyyy-mm-dd hh:mm:ss. Files are named the way HOBO names them, serial number first. The
+temperatures follow the seasons and the time of day, and once a sensor is buried in snow its
+temperature sits just under freezing and barely moves, which is what the snow coding looks
+for. Higher poles get snow earlier, keep it longer and get it deeper. Some readings are left
+blank (a single space, the way a logger hiccup shows up) and some stretches of readings are
+missing altogether.
+
+From the command line:
+    python synthetic.py fakeData --poles 15 --years 1
+writes fakeData/CSVFiles/*.csv and fakeData/Poles.csv. python synthetic.py --help lists the
+other options.
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+
+#sensor heights (m) used for each pole, the first sensorsPerPole of them are used
+heights=[0.25, 0.5, 1, 2, 3, 4]
+
+#the name HOBO gives an export is the serial number followed by when it was exported
+exportStamp=' 2021-08-19 10_39_21 -0800.csv'
+
+
+"""
+makeSyntheticData
+-----------------------------------------------------------------
+writes a made up data set to a folder
+
+inputs:
+    outDir (string): folder to write to. The exports go in outDir/CSVFiles and the pole
+        information in outDir/Poles.csv
+    poles (int): number of poles
+    sensorsPerPole (int): number of sensors on each pole (up to 6)
+    years (float): how long the loggers were out, starting on October 1st of startYear
+    intervalMinutes (int): minutes between readings
+    startYear (int): year the loggers were put out
+    gapRate (float): chance that a missing stretch of readings starts at any reading
+    blankRate (float): fraction of readings left blank
+    seed (int): seed for the random numbers, the same seed always makes the same data
+outputs:
+    dataDir (string): the folder the exports were written to
+    poleFile (string): path of the Poles.csv file
+"""
+
+def makeSyntheticData(outDir, poles=15, sensorsPerPole=4, years=1, intervalMinutes=60, startYear=2020,
+                      gapRate=0.0005, blankRate=0.001, seed=0):
+    if not 1<=sensorsPerPole<=len(heights):
+        raise ValueError("sensorsPerPole must be between 1 and %d" %len(heights))
+    rng=np.random.default_rng(seed)
+    dataDir=os.path.join(outDir, 'CSVFiles')
+    os.makedirs(dataDir, exist_ok=True)
+
+    start=pd.Timestamp(startYear, 10, 1)
+    times=pd.date_range(start, periods=int(years*365*24*60/intervalMinutes), freq='%dmin' %intervalMinutes)
+    stamps=np.asarray(times.strftime('%Y-%m-%d %H:%M:%S'))
+    dayOfRun=((times-start)/pd.Timedelta(days=1)).to_numpy()
+    hourOfDay=times.hour.to_numpy()+times.minute.to_numpy()/60
+
+    #air temperature (F): coldest in mid january, warmest in mid july, with a daily swing
+    daysFromJan15=((times.dayofyear.to_numpy()-15)%365)
+    air=45-20*np.cos(2*np.pi*daysFromJan15/365)+6*np.sin(2*np.pi*(hourOfDay-9)/24)
+
+    rows=[]
+    serial=20500000
+    for pole in range(1, poles+1):
+        elevation=int(rng.integers(200, 500))
+        latitude=round(58.04+rng.uniform(0, 0.02), 5)
+        longitude=round(-135.48+rng.uniform(0, 0.1), 5)
+        transect=int(rng.integers(1, 4))
+        deployDay=int(rng.integers(1, 15))
+        #higher poles get snow earlier, lose it later and get more of it
+        high=(elevation-200)/300
+        depth=rng.uniform(0.3, 1.5)+1.5*high
+        #first and last day of snow each winter, counted from october 1st of the first year
+        seasons=[(year*365+rng.normal(50-25*high, 8), year*365+rng.normal(170+40*high, 10))
+                 for year in range(int(np.ceil(years)))]
+
+        for height in heights[0:sensorsPerPole]:
+            serial+=1
+            rows.append([serial, height, pole, '10/%d/%d' %(deployDay, startYear), latitude, longitude, transect, elevation])
+
+            #buried whenever the snow (which builds up and melts off over the season) is deeper than the sensor
+            buried=np.zeros(len(times), dtype=bool)
+            for onset, melt in seasons:
+                season=(dayOfRun>=onset) & (dayOfRun<=melt)
+                shape=np.sin(np.pi*np.clip((dayOfRun-onset)/(melt-onset), 0, 1))
+                buried|=season & (depth*shape+0.2>=height)
+            temps=np.where(buried, 31.6+rng.normal(0, 0.2, len(times)), air+rng.normal(0, 1.5, len(times)))
+            temps=np.round(temps, 3).astype(object)
+            temps[rng.random(len(times))<blankRate]=' '
+
+            #missing stretches of up to two days
+            keep=np.ones(len(times), dtype=bool)
+            for gapStart in np.flatnonzero(rng.random(len(times))<gapRate):
+                keep[gapStart:gapStart+int(rng.integers(1, 48*60//intervalMinutes))]=False
+
+            writeExport(os.path.join(dataDir, str(serial)+exportStamp), serial, stamps[keep], temps[keep])
+
+    poleFile=os.path.join(outDir, 'Poles.csv')
+    pd.DataFrame(rows, columns=['Serial Number','Height','PoleNumber','DeployDate','latitude','longitude',
+                                'TrasectNumber','Elevation']).to_csv(poleFile, index=False)
+    return dataDir, poleFile
+
+
+"""
+writeExport
+-----------------------------------------------------------------
+writes one sensor's readings in the layout of a HOBO csv export
+
+inputs:
+    filePath (string): where to write it
+    serial (int): the logger's serial number
+    stamps (array of strings): date and time of each reading
+    temps (array): temperature of each reading, or ' ' for a blank one
+outputs:
+    none
+"""
+
+def writeExport(filePath, serial, stamps, temps):
+    with open(filePath, 'w', newline='', encoding='utf-8') as f:
+        f.write('"Serial Number %d",""\n' %serial)
+        f.write('"Plot Title: %d",""\n' %serial)
+        f.write('"Date-Time (AKDT)","Temperature , °F"\n')
+        f.write('\n'.join(stamps+','+temps.astype(str)))
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description="Write made up HOBO exports and a matching Poles.csv.")
+    parser.add_argument('outDir', help="folder to write to")
+    parser.add_argument('--poles', type=int, default=15)
+    parser.add_argument('--sensors', type=int, default=4, help="sensors per pole")
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--interval', type=int, default=60, help="minutes between readings")
+    parser.add_argument('--seed', type=int, default=0)
+    args=parser.parse_args()
+    dataDir, poleFile=makeSyntheticData(args.outDir, args.poles, args.sensors, args.years, args.interval, seed=args.seed)
+    print("Made up data written to %s and %s" %(dataDir, poleFile))